@@ -3,6 +3,6 @@ set -o errexit
 
 pip install -r requirements.txt
 
-python manage.py collectstatic --no-input
+python manage.py build_static
 
 python manage.py migrate
\ No newline at end of file
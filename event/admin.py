@@ -57,6 +57,14 @@ class SubmissionAdmin(admin.ModelAdmin):
     search_fields = ('project_title', 'team__team_name')
 
 
+# --- Background Job Admin Configuration ---
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'status', 'attempts', 'run_at', 'updated_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('last_error',)
+
+
 # --- Register All Other Models ---
 admin.site.register(models.ProblemStatement)
 admin.site.register(models.Organizer)
@@ -67,4 +75,5 @@ admin.site.register(models.TeamMember)
 admin.site.register(models.TeamInvite)
 admin.site.register(models.JudgingScore)
 admin.site.register(models.Announcement)
-admin.site.register(models.Notification)
\ No newline at end of file
+admin.site.register(models.Notification)
+admin.site.register(models.Certificate)
\ No newline at end of file
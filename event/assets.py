@@ -0,0 +1,130 @@
+"""
+Resized copies of the site's images, built with the static files.
+
+Each image in RESPONSIVE_IMAGES is shown at the listed CSS sizes. During
+collectstatic (see event/storage.py) every size is rendered at 1x and 2x, as
+AVIF, WebP and PNG, under images/variants/, and the copies are then hashed
+like any other static file. The `responsive_image` template tag (see
+event/templatetags/assets.py) emits a <picture> that lets the browser pick the
+smallest format it understands at the width it needs, instead of every visitor
+downloading the full-size PNG.
+
+Until the copies have been built (DEBUG, or a storage without a manifest) the
+tag falls back to the original image, so templates work either way. AVIF and
+WebP copies are only built when Pillow can encode them; PNG always is.
+"""
+import io
+import posixpath
+
+from django.contrib.staticfiles.storage import HashedFilesMixin, staticfiles_storage
+from django.templatetags.static import static
+from PIL import Image, features
+
+# Image -> sizes (CSS pixels, the larger side) it is displayed at.
+RESPONSIVE_IMAGES = {
+    'images/logo.png': (32,),  # header logo and favicon
+    'images/microcare_logo.png': (96,),
+    'images/itlu_logo.png': (96,),
+}
+DENSITIES = (1, 2)
+# In order of preference; the last one is the <img> fallback every browser reads.
+FORMATS = (
+    ('avif', 'image/avif', {'quality': 60}),
+    ('webp', 'image/webp', {'quality': 80, 'method': 6}),
+    ('png', 'image/png', {'optimize': True}),
+)
+
+
+def variant_name(name, width, extension):
+    """
+    'images/logo.png', 64, 'webp' -> 'images/variants/logo-64w.webp'
+    """
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f'{stem}-{width}w.{extension}')
+
+
+def available_formats():
+    """
+    The FORMATS this Pillow build can encode.
+    """
+    return [entry for entry in FORMATS if entry[0] == 'png' or features.check(entry[0])]
+
+
+def variant_widths(size, original_width):
+    """
+    The pixel widths to build for an image shown `size` CSS pixels wide. Never
+    upscales: a 2x copy wider than the original is replaced by the original width.
+    """
+    return sorted({min(size * density, original_width) for density in DENSITIES})
+
+
+def render_variants(name, file):
+    """
+    Yield (variant name, bytes) for every copy of the image `name` (read from
+    `file`) listed in RESPONSIVE_IMAGES.
+    """
+    with Image.open(file) as image:
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    widths = sorted({
+        width for size in RESPONSIVE_IMAGES[name] for width in variant_widths(size, image.width)
+    })
+    for width in widths:
+        height = max(round(image.height * width / image.width), 1)
+        resized = image.resize((width, height), Image.LANCZOS)
+        # A 256-colour palette is plenty for a logo and makes the PNG a third of the size.
+        paletted = resized.quantize(256, method=Image.Quantize.FASTOCTREE)
+        for extension, _, options in available_formats():
+            buffer = io.BytesIO()
+            (paletted if extension == 'png' else resized).save(buffer, extension.upper(), **options)
+            yield variant_name(name, width, extension), buffer.getvalue()
+
+
+def built_copies(name, extension):
+    """
+    [(variant name, width)] of the built copies of `name` in `extension`,
+    narrowest first; empty until collectstatic has built them.
+    """
+    manifest = getattr(staticfiles_storage, 'hashed_files', None)
+    if not isinstance(staticfiles_storage, HashedFilesMixin) or not manifest:
+        return []
+    prefix = variant_name(name, 0, extension).rpartition('-0w.')[0] + '-'
+    suffix = f'w.{extension}'
+    copies = []
+    for stored in manifest:
+        if stored.startswith(prefix) and stored.endswith(suffix):
+            width = stored[len(prefix):-len(suffix)]
+            if width.isdigit():
+                copies.append((stored, int(width)))
+    return sorted(copies, key=lambda copy: copy[1])
+
+
+def srcsets(name):
+    """
+    [(content type, srcset)] for the image, best format first, or None if its
+    copies haven't been built. Each srcset lists every copy with its pixel
+    width, for the browser to choose from given the element's `sizes`. Formats
+    that weren't built are left out; the PNG copies are always last.
+    """
+    result = []
+    for extension, content_type, _ in FORMATS:
+        copies = built_copies(name, extension)
+        if not copies:
+            if extension == 'png':
+                return None
+            continue
+        result.append((content_type, ', '.join(f'{static(copy)} {width}w' for copy, width in copies)))
+    return result
+
+
+def variant_url(name, width, extension):
+    """
+    URL of the narrowest built copy of `name` at least `width` pixels wide (or
+    the widest there is), or of the original while none are built. A format
+    that wasn't built falls back to the PNG copies.
+    """
+    copies = built_copies(name, extension) or built_copies(name, 'png')
+    if not copies:
+        return static(name)
+    return static(next((copy for copy, built in copies if built >= width), copies[-1][0]))
@@ -0,0 +1,122 @@
+"""
+Async variants of the read-heavy views, used when settings.ASYNC_VIEWS is on.
+
+These are not async views in the full sense: none of them uses the async ORM.
+Each variant answers from the event loop only what it can answer from the
+cache alone: the anonymous home page, the schedule JSON, and (with a shared
+cache) conditional GETs whose ETag still matches (see
+`caching.etag_for(...).cached`). Everything else, i.e. every page that needs
+the database, runs the ordinary sync view through sync_to_async and holds a
+worker thread for the whole render, exactly as in sync mode. Pages bound by
+the database therefore gain no concurrency from async mode; the two modes
+always produce the same pages.
+
+Even the cache-only answers only pay off if the whole middleware chain can run
+async, which is why settings swaps in event.middleware.WhiteNoiseMiddleware
+alongside it. `manage.py benchmark_asgi` compares the two modes on the same data.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import get_resolver
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from . import caching, schedule, views
+from .participants import Participant
+
+
+def _async_variant(view, etag_func, login=True, anonymous_page=None):
+    """
+    Wrap the sync `view`. `etag_func` is the view's etag_for() function; `login`
+    says whether the view requires a logged-in user; `anonymous_page()` may
+    return a cached response body for anonymous users.
+    """
+    run_view = sync_to_async(view)
+
+    @wraps(view)
+    async def variant(request, *args, **kwargs):
+        user = await request.auser()
+        # The sync view and the templates read these; resolve them once here.
+        request.user = user
+        request.participant = Participant(user)
+
+        if request.method in ('GET', 'HEAD') and (user.is_authenticated or not login):
+            etag = etag_func.cached(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag is not None else None
+            response = get_conditional_response(request, etag=etag) if etag else None
+            if response is None and not user.is_authenticated and anonymous_page is not None:
+                page = anonymous_page()
+                if page is not None:
+                    response = HttpResponse(page)
+            if response is not None:
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+                return response
+        return await run_view(request, *args, **kwargs)
+
+    variant.sync_view = view
+    return variant
+
+
+async def schedule_json(request):
+    cached = cache.get(schedule.SCHEDULE_CACHE_KEY)
+    if cached is None:
+        return await sync_to_async(views.schedule_json)(request)
+    etag = quote_etag(cached['etag'])
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(cached['json'], content_type='application/json')
+        patch_cache_control(response, public=True, max_age=60)
+    response.headers.setdefault('ETag', etag)
+    return response
+
+schedule_json.sync_view = views.schedule_json
+
+
+home = _async_variant(views.home, views.home_etag, login=False, anonymous_page=caching.get_home_page)
+team_list = _async_variant(views.team_list, views.team_list_etag)
+participant_dashboard = _async_variant(views.participant_dashboard, views.participant_dashboard_etag)
+judge_dashboard = _async_variant(views.judge_dashboard, views.judge_dashboard_etag)
+notification_list = _async_variant(views.notification_list, views.notification_list_etag)
+
+# Sync view -> async variant, for urls.py and the benchmark.
+VARIANTS = {
+    variant.sync_view: variant
+    for variant in (home, schedule_json, team_list, participant_dashboard, judge_dashboard, notification_list)
+}
+
+
+SYNC_WHITENOISE = 'whitenoise.middleware.WhiteNoiseMiddleware'
+ASYNC_WHITENOISE = 'event.middleware.WhiteNoiseMiddleware'
+
+
+def middleware_for(middleware, enabled=True):
+    """
+    `middleware` (a MIDDLEWARE list) with the WhiteNoise entry matching the mode.
+    """
+    old, new = (SYNC_WHITENOISE, ASYNC_WHITENOISE) if enabled else (ASYNC_WHITENOISE, SYNC_WHITENOISE)
+    return [new if path == old else path for path in middleware]
+
+
+def url_patterns(resolver=None):
+    """
+    Every URLPattern in the project, with includes flattened.
+    """
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if hasattr(pattern, 'url_patterns'):
+            yield from url_patterns(pattern)
+        else:
+            yield pattern
+
+
+def use_async_views(enabled=True, patterns=None):
+    """
+    Point every URL pattern (or just `patterns`) at the async variant of its
+    view, or back at the sync view when `enabled` is false.
+    """
+    for pattern in (patterns if patterns is not None else url_patterns()):
+        sync_view = getattr(pattern.callback, 'sync_view', pattern.callback)
+        pattern.callback = VARIANTS.get(sync_view, sync_view) if enabled else sync_view
@@ -0,0 +1,132 @@
+"""
+Page-level caching helpers.
+
+The schedule and FAQ sections of index.html are wrapped in `{% cache %}` blocks
+and anonymous visitors get the whole rendered page from the cache. Read-mostly
+views also answer conditional GETs from per-model data versions (see below).
+Signals in event/signals.py drop or bump these whenever the content changes.
+
+Dropping an entry only reaches every worker when CACHES points at a shared
+backend. With a per-process cache (LocMemCache) the worker that handled the
+change is the only one to see it, so entries that rely on being dropped are
+kept for LOCAL_CACHE_TIMEOUT seconds instead (see `invalidated_timeout`).
+"""
+import hashlib
+import uuid
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.utils import make_template_fragment_key
+
+from . import notifications
+
+LOCAL_CACHE_TIMEOUT = 5
+
+
+def cache_is_shared():
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def invalidated_timeout(timeout):
+    """
+    `timeout` for an entry that is dropped whenever its content changes, when
+    the cache is shared; otherwise LOCAL_CACHE_TIMEOUT.
+    """
+    return timeout if cache_is_shared() else LOCAL_CACHE_TIMEOUT
+
+
+# Content only changes through the admin, which invalidates explicitly; the
+# timeout is a backstop.
+HOME_CACHE_TIMEOUT = 60 * 60 * 24
+HOME_FRAGMENTS = ('home_schedule', 'home_faqs')
+HOME_PAGE_KEY = 'home:anonymous-page'
+
+
+def home_cache_timeout():
+    return invalidated_timeout(HOME_CACHE_TIMEOUT)
+
+
+def get_home_page():
+    return cache.get(HOME_PAGE_KEY)
+
+
+def set_home_page(response):
+    cache.set(HOME_PAGE_KEY, response.content, home_cache_timeout())
+
+
+def invalidate_home():
+    cache.delete_many([make_template_fragment_key(name) for name in HOME_FRAGMENTS] + [HOME_PAGE_KEY])
+
+
+# --- Data versions ---
+# Each tracked model has a version token in the cache that signals replace on
+# every save/delete. Views build their ETag from the tokens they depend on, so
+# answering a conditional GET costs a few cache reads and no queries. Tokens are
+# random rather than counters, so an evicted or expired token can never bring
+# back an old ETag. A bump has to reach every worker, or the others would keep
+# answering 304 for content that changed, so versions (and with them ETags) are
+# only used when the cache is shared.
+VERSION_TIMEOUT = 60
+
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+
+def data_version(name):
+    return cache.get_or_set(f'version:{name}', _new_token, VERSION_TIMEOUT)
+
+
+def bump(*names):
+    cache.set_many({f'version:{name}': _new_token() for name in names}, VERSION_TIMEOUT)
+
+
+def _etag(request, versions, unread, extra_values):
+    parts = [request.get_full_path(), request.META.get('CSRF_COOKIE', '')] + versions
+    if request.user.is_authenticated:
+        parts += [str(request.user.pk), str(unread)]
+    parts += [str(value) for value in extra_values]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def etag_for(*names, extra=None, allowed=None):
+    """
+    Build an `etag_func` for django.views.decorators.http.condition from the
+    versions of `names`, the request path and query string, and the per-user
+    state every page shows (role, unread badge, CSRF token). `extra(request)`
+    may return further values the page depends on. When `allowed(request)` is
+    false no ETag is produced, so the view's own permission check still runs;
+    nor is one without a shared cache (see VERSION_TIMEOUT).
+
+    The function's `cached` attribute computes the same ETag from the cache
+    alone (see event/async_views.py), returning None where that isn't possible.
+    """
+    def version_names(request):
+        if request.user.is_authenticated:
+            return list(names) + ['user', 'userprofile']
+        return list(names)
+
+    def etag_func(request, *args, **kwargs):
+        if not cache_is_shared() or (allowed is not None and not allowed(request)):
+            return None
+        versions = [data_version(name) for name in version_names(request)]
+        unread = notifications.unread_count(request.user) if request.user.is_authenticated else None
+        return _etag(request, versions, unread, extra(request) if extra else [])
+
+    def cached(request, *args, **kwargs):
+        if allowed is not None or not cache_is_shared():
+            return None
+        keys = [f'version:{name}' for name in version_names(request)]
+        found = cache.get_many(keys)
+        if len(found) < len(keys):
+            return None
+        unread = None
+        if request.user.is_authenticated:
+            unread = notifications.cached_unread_count(request.user)
+            if unread is None:
+                return None
+        return _etag(request, [found[key] for key in keys], unread, extra(request) if extra else [])
+
+    etag_func.cached = cached
+    return etag_func
@@ -0,0 +1,153 @@
+import hashlib
+import os
+from PIL import Image, ImageDraw, ImageFont
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from . import caching, jobs
+from .models import Certificate
+
+RENDER_JOB = 'certificate.render'
+
+
+def _template_path():
+    return os.path.join(settings.BASE_DIR, 'static/images/certificate_template.png')
+
+
+def _font_path():
+    return os.path.join(settings.BASE_DIR, 'static/fonts/Inter-Bold.ttf')
+
+
+# The template image, font and their combined hash are loaded once per process
+# and reused for every certificate that process renders.
+_assets = None
+_template_version = None
+
+
+def load_assets():
+    global _assets
+    if _assets is None:
+        with Image.open(_template_path()) as template:
+            template.load()
+            _assets = (template.copy(), ImageFont.truetype(_font_path(), 60))
+    return _assets
+
+
+def template_version():
+    """
+    Hash of the template image and font; changing either one changes every certificate key.
+    """
+    global _template_version
+    if _template_version is None:
+        digest = hashlib.sha256()
+        for path in (_template_path(), _font_path()):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _template_version = digest.hexdigest()[:16]
+    return _template_version
+
+
+def certificate_name(participant):
+    return participant.get_full_name() or participant.username
+
+
+def certificate_key(name):
+    """
+    Content address of a certificate: the same name on the same template always
+    maps to the same file, and a rename maps to a new one.
+    """
+    return hashlib.sha256(f'{template_version()}:{name}'.encode()).hexdigest()[:32]
+
+
+def certificate_path(name):
+    return f'certificates/{certificate_key(name)}.png'
+
+
+def draw_certificate(name):
+    """
+    Draw `name` onto the certificate template and return the path of the saved
+    PNG, relative to MEDIA_ROOT. The file is written to a temporary name and
+    moved into place, so readers never see a half-written image.
+    """
+    template, font = load_assets()
+    image = template.copy()
+    draw = ImageDraw.Draw(image)
+
+    # Deprecated method `textlength` replaced with `font.getbbox` for modern Pillow versions
+    text_box = draw.textbbox((0, 0), name, font=font)
+    text_width = text_box[2] - text_box[0]
+    position = ((image.width - text_width) / 2, 550) # Adjust Y-coordinate as needed
+
+    draw.text(position, name, font=font, fill=(0, 0, 0))
+
+    relative_path = certificate_path(name)
+    file_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f'{file_path}.{os.getpid()}.tmp'
+    try:
+        image.save(tmp_path, format='PNG')
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return relative_path
+
+
+def ensure_certificate(name):
+    """
+    Return the path of the certificate for `name`, rendering it only if no
+    certificate with that content address exists yet.
+    """
+    relative_path = certificate_path(name)
+    if not os.path.exists(os.path.join(settings.MEDIA_ROOT, relative_path)):
+        draw_certificate(name)
+    return relative_path
+
+
+def queue_certificates(user_ids):
+    """
+    Create pending Certificate rows for the users in `user_ids` who don't have
+    one yet. The row marks the user as eligible; the image itself is rendered on
+    first download, or right away by a background job when CERTIFICATE_PRERENDER is on.
+    """
+    user_ids = set(user_ids)
+    user_ids -= set(Certificate.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    if not user_ids:
+        return
+    Certificate.objects.bulk_create([Certificate(user_id=user_id, status='pending') for user_id in user_ids])
+    caching.bump('certificate')
+    if getattr(settings, 'CERTIFICATE_PRERENDER', False):
+        jobs.enqueue_many(RENDER_JOB, [{'user_id': user_id} for user_id in sorted(user_ids)])
+
+
+def record_rendered(certificate, name, relative_path):
+    """
+    Point the Certificate row at the file it was last served from; a no-op when nothing changed.
+    """
+    if certificate.status == 'ready' and certificate.rendered_name == name and certificate.certificate_file.name == relative_path:
+        return
+    certificate.status = 'ready'
+    certificate.rendered_name = name
+    certificate.certificate_file = relative_path
+    certificate.save(update_fields=['status', 'rendered_name', 'certificate_file'])
+
+
+@jobs.register(RENDER_JOB)
+def render_certificate_job(user_id):
+    participant = User.objects.get(pk=user_id)
+    name = certificate_name(participant)
+    Certificate.objects.update_or_create(
+        user=participant,
+        defaults={
+            'certificate_file': ensure_certificate(name),
+            'status': 'ready',
+            'rendered_name': name,
+        },
+    )
+
+
+@jobs.on_failure(RENDER_JOB)
+def mark_certificate_failed(user_id):
+    Certificate.objects.filter(user_id=user_id).update(status='failed')
+    caching.bump('certificate')
@@ -1,10 +1,26 @@
-from .models import Notification
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import unread_count
 
 def unread_notifications_count(request):
     """
-    A context processor to add the unread notification count to the context of every template.
+    A context processor to add the unread notification count to the context of every template,
+    and whether pages keep it current over the notification stream (settings.LIVE_NOTIFICATIONS).
+    The count is lazy, so templates that never show the badge never look it up.
     """
     if request.user.is_authenticated:
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return {'unread_count': count}
-    return {}
\ No newline at end of file
+        user = request.user
+        return {
+            'unread_count': SimpleLazyObject(lambda: unread_count(user)),
+            'live_notifications': settings.LIVE_NOTIFICATIONS,
+        }
+    return {}
+
+def participant(request):
+    """
+    Expose the request's Participant (see event/participants.py) to templates.
+    """
+    if hasattr(request, 'participant'):
+        return {'participant': request.participant}
+    return {}
@@ -0,0 +1,137 @@
+"""
+Flat CSV exports of event data.
+
+Each dataset is a single joined `values_list` query read with `.iterator()`,
+so exporting the whole event holds one chunk of rows in memory at a time.
+Under ASGI the response streams from `astream_csv`: the server would read a
+sync iterator whole before sending anything.
+
+Team names, titles and the like are typed by participants, so text cells that
+a spreadsheet would read as a formula are prefixed with a quote.
+"""
+import csv
+import itertools
+
+from asgiref.sync import sync_to_async
+
+from .models import JudgingScore, Submission, Team, TeamMember
+
+CHUNK_SIZE = 2000
+# Leading characters that make Excel and LibreOffice evaluate a cell.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+DATASETS = {
+    'teams': (
+        Team.objects.order_by('id'),
+        [
+            ('team_id', 'id'),
+            ('team_name', 'team_name'),
+            ('team_code', 'team_code'),
+            ('leader', 'leader__username'),
+            ('leader_email', 'leader__email'),
+            ('selected_problem', 'selected_problem__title'),
+            ('max_size', 'max_size'),
+            ('created_at', 'created_at'),
+        ],
+    ),
+    'members': (
+        TeamMember.objects.order_by('team_id', 'id'),
+        [
+            ('team_id', 'team_id'),
+            ('team_name', 'team__team_name'),
+            ('username', 'participant__username'),
+            ('email', 'participant__email'),
+            ('first_name', 'participant__first_name'),
+            ('last_name', 'participant__last_name'),
+            ('role', 'role'),
+            ('status', 'status'),
+            ('joined_at', 'joined_at'),
+        ],
+    ),
+    'submissions': (
+        Submission.objects.order_by('id'),
+        [
+            ('submission_id', 'id'),
+            ('team_id', 'team_id'),
+            ('team_name', 'team__team_name'),
+            ('problem_statement', 'problem_statement__title'),
+            ('project_title', 'project_title'),
+            ('repo_link', 'repo_link'),
+            ('demo_link', 'demo_link'),
+            ('plan_pdf', 'plan_pdf'),
+            ('submitted_at', 'submitted_at'),
+        ],
+    ),
+    'scores': (
+        JudgingScore.objects.order_by('submission_id', 'judge_id'),
+        [
+            ('submission_id', 'submission_id'),
+            ('team_name', 'submission__team__team_name'),
+            ('project_title', 'submission__project_title'),
+            ('judge', 'judge__username'),
+            ('score', 'score'),
+            ('feedback', 'feedback'),
+        ],
+    ),
+}
+
+
+class Echo:
+    """
+    A file-like object whose write() just returns the value, so csv.writer
+    can produce lines for a streaming response.
+    """
+    def write(self, value):
+        return value
+
+
+def header(dataset):
+    return [column for column, _ in DATASETS[dataset][1]]
+
+
+def rows(dataset):
+    queryset, columns = DATASETS[dataset]
+    return queryset.values_list(*[field for _, field in columns]).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _cells(row):
+    return [
+        f"'{value}" if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+        for value in row
+    ]
+
+
+def stream_csv(dataset):
+    """
+    Yield the dataset as CSV lines, header first.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(header(dataset))
+    for row in rows(dataset):
+        yield writer.writerow(_cells(row))
+
+
+async def astream_csv(dataset):
+    """
+    The same CSV for an ASGI response: each chunk of rows is fetched and
+    formatted in the sync thread, so one chunk of lines is held at a time.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(header(dataset))
+    remaining = rows(dataset)
+    # thread_sensitive (the default) keeps every chunk on the thread holding the cursor.
+    next_lines = sync_to_async(
+        lambda: ''.join(writer.writerow(_cells(row)) for row in itertools.islice(remaining, CHUNK_SIZE))
+    )
+    while lines := await next_lines():
+        yield lines
+
+
+def write_csv(dataset, file):
+    writer = csv.writer(file)
+    writer.writerow(header(dataset))
+    count = 0
+    for row in rows(dataset):
+        writer.writerow(_cells(row))
+        count += 1
+    return count
@@ -98,16 +98,15 @@ class TeamInviteForm(forms.Form):
 class SubmissionPlaygroundForm(forms.ModelForm):
     class Meta:
         model = Submission
-        fields = ['ideation_text', 'plan_pdf', 'repo_link', 'demo_link']
+        # plan_pdf is uploaded in chunks through its own endpoint; see event/uploads.py.
+        fields = ['ideation_text', 'repo_link', 'demo_link']
         widgets = {
             'ideation_text': forms.Textarea(attrs={'class': 'mt-1 block w-full bg-brand-bg border-gray-600 rounded-md py-2 px-3 text-brand-text', 'rows': 6}),
-            'plan_pdf': forms.FileInput(attrs={'class': 'mt-1 block w-full text-gray-400 file:mr-4 file:py-2 file:px-4 file:rounded-full file:border-0 file:text-sm file:font-semibold file:bg-brand-accent-2 file:text-white hover:file:bg-purple-600'}),
             'repo_link': forms.URLInput(attrs={'class': 'mt-1 block w-full bg-brand-bg border-gray-600 rounded-md py-2 px-3 text-brand-text'}),
             'demo_link': forms.URLInput(attrs={'class': 'mt-1 block w-full bg-brand-bg border-gray-600 rounded-md py-2 px-3 text-brand-text'}),
         }
         labels = {
             'ideation_text': 'Your Ideation',
-            'plan_pdf': 'Implementation Plan (PDF only)',
             'repo_link': 'Prototype/GitHub Link',
             'demo_link': 'Video Demo Link'
         }
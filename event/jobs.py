@@ -0,0 +1,161 @@
+"""
+A small database-backed job queue.
+
+Jobs are rows in the `Job` table; `manage.py run_jobs` claims and runs them.
+Claiming is a conditional UPDATE on the row's status, so any number of worker
+processes can poll the same table without handing out a job twice. A job still
+'running' LEASE_SECONDS after it was claimed belonged to a worker that died,
+and is put back in the queue (or failed, if that was its last attempt).
+"""
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+_failure_handlers = {}
+
+# Seconds to wait before retry N (1-based); the last value is reused after that.
+RETRY_DELAYS = [10, 60, 300]
+# No job takes this long; one 'running' for longer has lost its worker.
+LEASE_SECONDS = 600
+
+
+def register(kind):
+    """
+    Decorator registering `func(**payload)` as the handler for jobs of `kind`.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def on_failure(kind):
+    """
+    Decorator registering a callback run once a job of `kind` has used up its attempts.
+    """
+    def decorator(func):
+        _failure_handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, max_attempts=3, **payload):
+    return Job.objects.create(kind=kind, payload=payload, max_attempts=max_attempts)
+
+
+def enqueue_many(kind, payloads, max_attempts=3):
+    return Job.objects.bulk_create(
+        [Job(kind=kind, payload=payload, max_attempts=max_attempts) for payload in payloads]
+    )
+
+
+def claim_next():
+    """
+    Atomically move the oldest due job from 'queued' to 'running', counting the
+    attempt, and return it, or None if nothing is due.
+    """
+    candidates = Job.objects.filter(status='queued', run_at__lte=timezone.now()).order_by('run_at', 'id')
+    for job_id in candidates.values_list('id', flat=True)[:10]:
+        # The attempt is counted here, so a job whose worker dies mid-run still uses one up.
+        claimed = Job.objects.filter(id=job_id, status='queued').update(
+            status='running', attempts=F('attempts') + 1, updated_at=timezone.now()
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def _gave_up(job):
+    """
+    Run the failure callback registered for the job's kind, if any.
+    """
+    failed = _failure_handlers.get(job.kind)
+    if failed is not None:
+        try:
+            failed(**job.payload)
+        except Exception:
+            # The job is failed either way; don't leave it 'running'.
+            logger.exception("Failure handler for job %s raised.", job)
+
+
+def reclaim_stale():
+    """
+    Requeue jobs left 'running' by a worker that died, or fail them (running
+    their failure callback) if that was their last attempt. Returns the number
+    of jobs reclaimed.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', updated_at__lt=now - timedelta(seconds=LEASE_SECONDS))
+    failed = 0
+    for job in stale.filter(attempts__gte=F('max_attempts')):
+        # Conditional, like claiming, so two workers reclaiming at once fail a job only once.
+        if Job.objects.filter(pk=job.pk, status='running').update(
+            status='failed', last_error='Worker stopped while running the job.', updated_at=now
+        ):
+            failed += 1
+            _gave_up(job)
+    requeued = stale.update(status='queued', run_at=now, updated_at=now)
+    if failed or requeued:
+        logger.warning("Reclaimed %s stale job(s): %s requeued, %s failed.", failed + requeued, requeued, failed)
+    return failed + requeued
+
+
+def run_job(job):
+    """
+    Run a job returned by claim_next() and record the outcome: done, queued
+    again after a delay, or failed once its attempts are used up.
+    """
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'.")
+        with transaction.atomic():
+            handler(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = RETRY_DELAYS[min(job.attempts, len(RETRY_DELAYS)) - 1]
+            job.status = 'queued'
+            job.run_at = timezone.now() + timedelta(seconds=delay)
+            logger.warning("Job %s failed (attempt %s), retrying in %ss.", job, job.attempts, delay)
+        else:
+            job.status = 'failed'
+            logger.error("Job %s failed permanently after %s attempts.", job, job.attempts)
+            _gave_up(job)
+    else:
+        job.status = 'done'
+        job.last_error = ''
+    job.save(update_fields=['status', 'run_at', 'last_error', 'updated_at'])
+    return job
+
+
+def work(stop_when_empty=False, poll_interval=2.0, should_stop=lambda: False):
+    """
+    Run jobs until `should_stop()` is true (or the queue is empty, if `stop_when_empty`).
+    Returns the number of jobs processed.
+    """
+    processed = 0
+    next_reclaim = 0
+    while not should_stop():
+        if time.monotonic() >= next_reclaim:
+            reclaim_stale()
+            next_reclaim = time.monotonic() + LEASE_SECONDS / 10
+        job = claim_next()
+        if job is None:
+            if stop_when_empty:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,108 @@
+"""
+Leaderboard snapshot.
+
+Scores are normalised per judge (z-score against that judge's own mean and
+spread) so a harsh or lenient judge doesn't skew the ranking. Results are
+stored in `LeaderboardEntry`, so reading the leaderboard is one indexed query.
+"""
+import math
+from collections import defaultdict
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import JudgingScore, LeaderboardEntry
+
+
+def _judge_stats(scores):
+    """
+    Mean and population standard deviation of each judge's scores.
+    """
+    by_judge = defaultdict(list)
+    for judge_id, _, score in scores:
+        by_judge[judge_id].append(score)
+    stats = {}
+    for judge_id, values in by_judge.items():
+        mean = sum(values) / len(values)
+        variance = sum((value - mean) ** 2 for value in values) / len(values)
+        stats[judge_id] = (mean, math.sqrt(variance))
+    return stats
+
+
+def _z(score, mean, std):
+    # A judge with a single score (or identical scores) carries no information about spread.
+    return (score - mean) / std if std > 0 else 0.0
+
+
+def compute(submission_ids=None):
+    """
+    Build LeaderboardEntry objects (unsaved) for `submission_ids`, or for every
+    scored submission. Judge statistics always use all of each judge's scores.
+    """
+    scores = [
+        (judge_id, submission_id, float(score))
+        for judge_id, submission_id, score in JudgingScore.objects.values_list('judge_id', 'submission_id', 'score')
+        if score is not None
+    ]
+    stats = _judge_stats(scores)
+
+    by_submission = defaultdict(list)
+    for judge_id, submission_id, score in scores:
+        if submission_ids is None or submission_id in submission_ids:
+            by_submission[submission_id].append((score, _z(score, *stats[judge_id])))
+
+    return [
+        LeaderboardEntry(
+            submission_id=submission_id,
+            score_count=len(values),
+            mean_score=sum(raw for raw, _ in values) / len(values),
+            normalized_score=sum(z for _, z in values) / len(values),
+        )
+        for submission_id, values in by_submission.items()
+    ]
+
+
+@transaction.atomic
+def refresh(submission_ids=None):
+    """
+    Recompute and store the snapshot for `submission_ids` (or everything).
+    Submissions that no longer have any scores are removed from the leaderboard.
+    """
+    entries = compute(submission_ids)
+    stale = LeaderboardEntry.objects.all()
+    if submission_ids is not None:
+        stale = stale.filter(submission_id__in=submission_ids)
+    stale.exclude(submission_id__in=[entry.submission_id for entry in entries]).delete()
+    fields = ['score_count', 'mean_score', 'normalized_score', 'updated_at']
+    if connections[LeaderboardEntry.objects.db].features.supports_update_conflicts_with_target:
+        LeaderboardEntry.objects.bulk_create(
+            entries, update_conflicts=True, unique_fields=['submission'], update_fields=fields,
+        )
+        return len(entries)
+    # No ON CONFLICT (submission) on this database (MySQL): update the rows that exist, insert the rest.
+    existing = set(
+        LeaderboardEntry.objects.filter(submission_id__in=[entry.submission_id for entry in entries])
+        .values_list('submission_id', flat=True)
+    )
+    now = timezone.now()
+    for entry in entries:
+        entry.updated_at = now
+    LeaderboardEntry.objects.bulk_update([entry for entry in entries if entry.submission_id in existing], fields)
+    LeaderboardEntry.objects.bulk_create([entry for entry in entries if entry.submission_id not in existing])
+    return len(entries)
+
+
+def refresh_for_judge(judge_id, submission_id=None):
+    """
+    A change to one judge's score shifts that judge's mean and spread, so every
+    submission the judge has scored needs its normalised score recomputed.
+    """
+    affected = set(JudgingScore.objects.filter(judge_id=judge_id).values_list('submission_id', flat=True))
+    if submission_id is not None:
+        affected.add(submission_id)
+    if affected:
+        refresh(affected)
+
+
+def ranking():
+    return LeaderboardEntry.objects.select_related('submission__team').order_by('-normalized_score', '-mean_score')
@@ -0,0 +1,205 @@
+"""
+Live events for the notification stream (the `notification_stream` SSE view).
+
+Signals (see event/signals.py) publish an event once the transaction that
+created a Notification or Announcement commits. Each open stream subscribes
+to its user's channel and the shared announcements channel with an asyncio
+queue. The stream reads the unread count once, then closes its database
+connection before it starts waiting, so an idle stream holds no database
+connection. It does keep the idle thread Django gives every ASGI request for
+its sync middleware, until the client disconnects.
+
+settings.LIVE_EVENTS_BACKEND picks how events reach the subscribers:
+
+- 'local' (default): fan out within this process. Only used when the site
+  runs a single worker (settings.WEB_CONCURRENCY); with more, an event would
+  miss the streams held by the other workers, so streams fall back to polling
+  the count instead (see `reaches_every_worker`).
+- 'postgres': publish with pg_notify() and have one thread per process LISTEN
+  and fan the payloads out locally, so every worker sees every event.
+
+Pages only open a stream when settings.LIVE_NOTIFICATIONS is on.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+from .notifications import _announcement_message
+
+logger = logging.getLogger(__name__)
+
+ANNOUNCEMENTS = 'announcements'
+PG_CHANNEL = 'event_live'
+# NOTIFY payloads are limited to 8000 bytes; messages are cut well short of it.
+MAX_MESSAGE_LENGTH = 1000
+QUEUE_SIZE = 100
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class LocalBroker:
+    """
+    In-process fan-out from publishers on any thread to asyncio queues.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channels):
+        """
+        A queue receiving (event, data) for the given channels, bound to the running loop.
+        """
+        queue = asyncio.Queue(QUEUE_SIZE)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(entry)
+        queue.channels = tuple(channels)
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            for channel in queue.channels:
+                entries = self._subscribers.get(channel, set())
+                entries.difference_update({entry for entry in entries if entry[1] is queue})
+                if not entries:
+                    self._subscribers.pop(channel, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({id(queue) for entries in self._subscribers.values() for _, queue in entries})
+
+    def publish(self, channel, event, data):
+        with self._lock:
+            entries = list(self._subscribers.get(channel, ()))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, (event, data))
+            except RuntimeError:
+                # The subscriber's loop has closed; it unsubscribes on its way out.
+                pass
+
+
+def _offer(queue, item):
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        # A client this far behind re-reads the unread count when it reconnects.
+        pass
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Publishes through NOTIFY; a listener thread relays every payload, including
+    this process's own, to the local subscribers.
+    """
+    POLL_SECONDS = 5
+
+    def __init__(self, using='default'):
+        super().__init__()
+        self.using = using
+        self._listener = None
+
+    def subscribe(self, channels):
+        self._ensure_listener()
+        return super().subscribe(channels)
+
+    def publish(self, channel, event, data):
+        payload = json.dumps({'channel': channel, 'event': event, 'data': data})
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [PG_CHANNEL, payload])
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='live-events-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                self._relay(self._connect())
+            except Exception:
+                logger.exception('Live events listener lost its connection; reconnecting')
+                time.sleep(1)
+
+    def _connect(self):
+        wrapper = connections[self.using]
+        raw = wrapper.get_new_connection(wrapper.get_connection_params())
+        raw.autocommit = True
+        with raw.cursor() as cursor:
+            cursor.execute(f'LISTEN {PG_CHANNEL}')
+        return raw
+
+    def _relay(self, raw):
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        try:
+            while True:
+                if is_psycopg3:
+                    notifies = list(raw.notifies(timeout=self.POLL_SECONDS, stop_after=1))
+                elif select.select([raw], [], [], self.POLL_SECONDS)[0]:
+                    raw.poll()
+                    notifies = raw.notifies[:]
+                    del raw.notifies[:]
+                else:
+                    notifies = []
+                for notify in notifies:
+                    message = json.loads(notify.payload)
+                    super().publish(message['channel'], message['event'], message['data'])
+        finally:
+            raw.close()
+
+
+_broker = None
+
+
+def broker():
+    global _broker
+    if _broker is None:
+        backend = getattr(settings, 'LIVE_EVENTS_BACKEND', 'local')
+        if backend == 'postgres' and connection.vendor != 'postgresql':
+            raise ValueError('LIVE_EVENTS_BACKEND = "postgres" needs a PostgreSQL database.')
+        _broker = PostgresBroker() if backend == 'postgres' else LocalBroker()
+    return _broker
+
+
+def reaches_every_worker():
+    """
+    Whether a published event reaches the streams held by every worker process.
+    """
+    if getattr(settings, 'LIVE_EVENTS_BACKEND', 'local') == 'postgres':
+        return True
+    return getattr(settings, 'WEB_CONCURRENCY', 1) == 1
+
+
+def publish_on_commit(channel, event, data):
+    transaction.on_commit(lambda: broker().publish(channel, event, data))
+
+
+def notification_created(notification):
+    publish_on_commit(user_channel(notification.user_id), 'notification', {
+        'id': notification.pk,
+        'message': notification.message[:MAX_MESSAGE_LENGTH],
+        'created_at': notification.created_at.isoformat(),
+    })
+
+
+def announcement_created(announcement):
+    publish_on_commit(ANNOUNCEMENTS, 'announcement', {
+        'id': announcement.pk,
+        'message': _announcement_message(announcement)[:MAX_MESSAGE_LENGTH],
+        'created_at': announcement.created_at.isoformat(),
+    })
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
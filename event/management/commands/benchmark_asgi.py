@@ -0,0 +1,155 @@
+import asyncio
+import json
+import statistics
+import time
+
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from event.async_views import middleware_for, url_patterns, use_async_views
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives the ASGI application in-process with concurrent requests and reports '
+        'throughput and latency per URL, with the sync views, the async views (ASYNC_VIEWS), or both. '
+        'The async views only skip the worker thread for responses served from the cache; '
+        'pages that query the database run the sync view in a thread in both modes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', default=['/', '/schedule.json'], help='Paths to request.')
+        parser.add_argument('--username', type=str, help='Send requests as this user (a session is created for them).')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per URL and mode.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight at once.')
+        parser.add_argument('--mode', choices=['both', 'async', 'sync'], default='both',
+                            help='Benchmark the sync views, the async views, or both on the same data.')
+        parser.add_argument('--conditional', action='store_true',
+                            help='Send back the ETag from the warm-up responses, as a polling client would.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        cookies = {}
+        if options['username']:
+            cookies[settings.SESSION_COOKIE_NAME] = self._session_for(options['username'])
+
+        modes = ['sync', 'async'] if options['mode'] == 'both' else [options['mode']]
+        results = []
+        patterns = list(url_patterns())
+        try:
+            for mode in modes:
+                enabled = mode == 'async'
+                use_async_views(enabled, patterns)
+                with override_settings(MIDDLEWARE=middleware_for(settings.MIDDLEWARE, enabled)):
+                    application = ASGIHandler()
+                for url in options['urls']:
+                    results.append(asyncio.run(self._run(application, url, mode, cookies, options)))
+        finally:
+            use_async_views(settings.ASYNC_VIEWS, patterns)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(self.style.NOTICE(
+            f"{'url':<28} {'mode':<6} {'status':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"
+        ))
+        for row in results:
+            self.stdout.write(
+                f"{row['url'][:28]:<28} {row['mode']:<6} {row['status']:<10} {row['requests_per_second']:>8} "
+                f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['max_ms']:>8}"
+            )
+        if 'async' in modes:
+            self.stdout.write(self.style.WARNING(
+                "Async mode doesn't use the async ORM: only the anonymous home page, the schedule JSON and "
+                "(with a shared cache) matching ETags are answered without a thread. Any page that queries "
+                "the database runs the sync view in a worker thread in both modes, so expect no concurrency "
+                "gain for those."
+            ))
+
+    def _session_for(self, username):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"User '{username}' not found.")
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+    async def _run(self, application, url, mode, cookies, options):
+        path, _, query = url.partition('?')
+        cookies = dict(cookies)
+        etag = None
+
+        def scope():
+            headers = [(b'host', b'localhost')]
+            if cookies:
+                headers.append((b'cookie', '; '.join(f'{k}={v}' for k, v in cookies.items()).encode()))
+            if etag:
+                headers.append((b'if-none-match', etag))
+            return {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                'root_path': '', 'headers': headers, 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+            }
+
+        async def request():
+            start = {}
+            sent = False
+
+            async def receive():
+                nonlocal sent
+                if not sent:
+                    sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await asyncio.sleep(3600)
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    start.update(message)
+
+            started = time.perf_counter()
+            await application(scope(), receive, send)
+            return time.perf_counter() - started, start['status'], start.get('headers', [])
+
+        # Warm caches and connections before measuring. Like a real client, keep
+        # the cookies (CSRF token) handed out, and with --conditional the ETag.
+        for _ in range(min(options['concurrency'], 5)):
+            _, _, response_headers = await request()
+            for name, value in response_headers:
+                name = name.lower()
+                if name == b'set-cookie':
+                    key, _, rest = value.decode().partition('=')
+                    cookies[key] = rest.split(';', 1)[0]
+                elif name == b'etag' and options['conditional']:
+                    etag = value
+
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def limited():
+            async with semaphore:
+                return await request()
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*[limited() for _ in range(options['requests'])])
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(duration * 1000 for duration, _, _ in samples)
+        statuses = sorted({status for _, status, _ in samples})
+        return {
+            'url': url,
+            'mode': mode,
+            'status': ','.join(str(status) for status in statuses),
+            'requests_per_second': round(len(samples) / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies), 2),
+            'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 2),
+            'max_ms': round(latencies[-1], 2),
+        }
@@ -0,0 +1,97 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from event import assets
+from event.storage import StaticFilesStorage
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _kib(size):
+    return f'{size / 1024:.1f} KiB'
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs collectstatic (which, with the production storage, hashes and compresses the files and builds '
+        'the resized images) and reports how many bytes the compressed and resized copies save'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Delete the existing files in STATIC_ROOT first.')
+        parser.add_argument('--no-collect', action='store_true', help='Only report on the files already built.')
+
+    def handle(self, *args, **options):
+        if not options['no_collect']:
+            call_command('collectstatic', interactive=False, clear=options['clear'], verbosity=0)
+            self.stdout.write(self.style.SUCCESS(f'Collected static files into {settings.STATIC_ROOT}.'))
+
+        if not isinstance(staticfiles_storage, StaticFilesStorage):
+            self.stdout.write(self.style.WARNING(
+                "STORAGES['staticfiles'] is not event.storage.StaticFilesStorage (it is only used with DEBUG off), "
+                "so no compressed or resized copies were built."
+            ))
+            return
+        self._report_images(staticfiles_storage)
+        self._report_compression(staticfiles_storage)
+
+    def _report_images(self, storage):
+        self.stdout.write(self.style.NOTICE(f"{'image':<40} {'original':>12} {'avif':>12} {'webp':>12} {'png':>12}"))
+        before = after = 0
+        for name, sizes in assets.RESPONSIVE_IMAGES.items():
+            original = _size(storage.path(storage.stored_name(name)))
+            for size in sizes:
+                # What a 1x screen downloads: the smallest copy at least `size` pixels wide.
+                row = {}
+                for extension, _, _ in assets.FORMATS:
+                    copies = assets.built_copies(name, extension)
+                    if copies:
+                        copy = next((copy for copy, width in copies if width >= size), copies[-1][0])
+                        row[extension] = _size(storage.path(storage.stored_name(copy)))
+                # Formats Pillow couldn't encode were not built.
+                best = next(iter(row), None)
+                if best is None:
+                    continue
+                before += original
+                after += row[best]
+                self.stdout.write(f"{f'{name} @{size}px':<40} {_kib(original):>12} " + ' '.join(
+                    f"{_kib(row[extension]) if extension in row else '-':>12}" for extension, _, _ in assets.FORMATS
+                ))
+        if before:
+            self.stdout.write(self.style.SUCCESS(
+                f'Images: {_kib(before)} -> {_kib(after)} in the best format built '
+                f'({100 - after * 100 / before:.1f}% smaller).'
+            ))
+
+    def _report_compression(self, storage):
+        totals = {'original': 0, 'gz': 0, 'br': 0}
+        compressed = brotli = 0
+        for hashed in set(storage.hashed_files.values()):
+            path = storage.path(hashed)
+            gz, br = _size(path + '.gz'), _size(path + '.br')
+            if gz is None and br is None:
+                continue
+            original = _size(path)
+            compressed += 1
+            brotli += br is not None
+            totals['original'] += original
+            totals['gz'] += gz or original
+            totals['br'] += br or gz or original
+        if not compressed:
+            self.stdout.write(self.style.WARNING('No compressed copies found.'))
+            return
+        line = f"Text assets ({compressed} files): {_kib(totals['original'])} -> {_kib(totals['gz'])} gzip"
+        if brotli:
+            line += f", {_kib(totals['br'])} Brotli"
+        else:
+            line += ' (install brotli for .br copies)'
+        self.stdout.write(self.style.SUCCESS(line + '.'))
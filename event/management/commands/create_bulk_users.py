@@ -1,54 +1,113 @@
 import csv
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from event.models import UserProfile   # make sure UserProfile has user_role field
-from django.db import transaction
+from django.db import connections, transaction
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 
 class Command(BaseCommand):
     help = 'Creates bulk user accounts (username, email, password, role) from a CSV file'
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='The path to the CSV file containing user data.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows per bulk insert.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes used to hash passwords.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file and report what would be created, without writing.')
 
-    @transaction.atomic
     def handle(self, *args, **options):
         csv_file_path = options['csv_file']
+        chunk_size = max(1, options['chunk_size'])
         self.stdout.write(self.style.NOTICE(f"Processing user data from {csv_file_path}"))
+        started = time.perf_counter()
 
         try:
             with open(csv_file_path, mode='r', encoding='utf-8-sig') as file:
-                reader = csv.DictReader(file)
+                rows = list(csv.DictReader(file))
+        except FileNotFoundError:
+            self.stdout.write(self.style.ERROR(f"File not found at {csv_file_path}"))
+            return
 
-                for row in reader:
-                    username = row.get('username')
-                    password = row.get('password')
-                    email = row.get('email')
-                    role = row.get('role')
+        # Validate rows and drop duplicates inside the file itself.
+        pending = {}
+        for row in rows:
+            username = row.get('username')
+            password = row.get('password')
+            email = row.get('email')
+            role = row.get('role')
 
-                    if not all([username, password, email, role]):
-                        self.stdout.write(self.style.ERROR(f"Skipping row due to missing data: {row}"))
-                        continue
+            if not all([username, password, email, role]):
+                self.stdout.write(self.style.ERROR(f"Skipping row due to missing data: {row}"))
+                continue
+            if username in pending:
+                self.stdout.write(self.style.WARNING(f"User '{username}' appears more than once in the file. Skipping the repeat."))
+                continue
+            pending[username] = (password, email, role)
 
-                    if User.objects.filter(username=username).exists():
-                        self.stdout.write(self.style.WARNING(f"User '{username}' already exists. Skipping."))
-                        continue
+        # One query per chunk to find accounts that already exist.
+        existing = set()
+        for chunk in _chunks(list(pending), chunk_size):
+            existing.update(User.objects.filter(username__in=chunk).values_list('username', flat=True))
+        for username in sorted(existing):
+            self.stdout.write(self.style.WARNING(f"User '{username}' already exists. Skipping."))
+            del pending[username]
 
-                    # Create the User object
-                    user = User.objects.create_user(
-                        username=username,
-                        password=password,
-                        email=email
-                    )
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Dry run: {len(pending)} user(s) would be created, {len(existing)} already exist."
+            ))
+            return
+        if not pending:
+            self.stdout.write(self.style.SUCCESS("No new users to create."))
+            return
 
-                    # Create the associated UserProfile with role
-                    UserProfile.objects.create(
-                        user=user,
-                        user_role=role
-                    )
+        # Hash each distinct password once, in parallel; rows sharing a password share its hash.
+        distinct_passwords = sorted({password for password, _, _ in pending.values()})
+        hash_started = time.perf_counter()
+        if options['workers'] > 1 and len(distinct_passwords) > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=min(options['workers'], len(distinct_passwords)),
+                mp_context=multiprocessing.get_context('fork'),
+            ) as pool:
+                hashes = dict(zip(distinct_passwords, pool.map(make_password, distinct_passwords)))
+        else:
+            hashes = {password: make_password(password) for password in distinct_passwords}
+        self.stdout.write(self.style.NOTICE(
+            f"Hashed {len(distinct_passwords)} distinct password(s) for {len(pending)} user(s) "
+            f"in {time.perf_counter() - hash_started:.2f}s."
+        ))
 
-                    self.stdout.write(self.style.SUCCESS(f"Successfully created user '{username}' with role '{role}'."))
+        created = 0
+        usernames = list(pending)
+        with transaction.atomic():
+            for chunk in _chunks(usernames, chunk_size):
+                User.objects.bulk_create([
+                    User(username=username, email=pending[username][1], password=hashes[pending[username][0]])
+                    for username in chunk
+                ])
+                # Re-read the ids rather than relying on bulk_create returning them (MySQL doesn't).
+                ids = dict(User.objects.filter(username__in=chunk).values_list('username', 'id'))
+                UserProfile.objects.bulk_create([
+                    UserProfile(user_id=ids[username], user_role=pending[username][2])
+                    for username in chunk
+                ])
+                created += len(chunk)
+                self.stdout.write(f"  {created}/{len(usernames)} users created")
 
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f"File not found at {csv_file_path}"))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"An unexpected error occurred: {e}"))
+        elapsed = time.perf_counter() - started
+        rate = created / elapsed if elapsed else float('inf')
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully created {created} user(s) in {elapsed:.2f}s ({rate:.1f} users/sec); "
+            f"{len(existing)} already existed."
+        ))
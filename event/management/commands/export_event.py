@@ -0,0 +1,31 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from event import exports
+
+
+class Command(BaseCommand):
+    help = 'Exports teams, members, submissions and scores as CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=sorted(exports.DATASETS), action='append',
+                            help='Dataset to export (repeatable). Defaults to all of them.')
+        parser.add_argument('--output-dir', type=str, default=None,
+                            help='Directory to write <dataset>.csv files into. Writes to stdout when omitted.')
+
+    def handle(self, *args, **options):
+        datasets = options['dataset'] or list(exports.DATASETS)
+        output_dir = options['output_dir']
+
+        if output_dir is None:
+            for dataset in datasets:
+                exports.write_csv(dataset, self.stdout)
+            return
+
+        os.makedirs(output_dir, exist_ok=True)
+        for dataset in datasets:
+            path = os.path.join(output_dir, f'{dataset}.csv')
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                count = exports.write_csv(dataset, file)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {count} row(s) to {path}"))
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from event import caching
+from event.certificates import certificate_name, certificate_path, draw_certificate, load_assets, template_version
+from event.models import Certificate, TeamMember
+
+
+def _init_worker():
+    # Load the template and font once per worker process, not once per certificate.
+    load_assets()
+
+
+def _render(user_id, name):
+    return user_id, name, draw_certificate(name)
+
+
+def _record(rendered, batch_size):
+    """
+    Upsert a ready Certificate row for every (user id, name, path) rendered.
+    """
+    certificates = [
+        Certificate(user_id=user_id, certificate_file=path, status='ready', rendered_name=name)
+        for user_id, name, path in rendered
+    ]
+    fields = ['certificate_file', 'status', 'rendered_name']
+    if connections[Certificate.objects.db].features.supports_update_conflicts_with_target:
+        Certificate.objects.bulk_create(
+            certificates, batch_size=batch_size, update_conflicts=True, unique_fields=['user'], update_fields=fields,
+        )
+        return
+    # No ON CONFLICT (user) on this database: update the rows that exist, insert the rest.
+    existing = dict(
+        Certificate.objects.filter(user_id__in=[c.user_id for c in certificates]).values_list('user_id', 'pk')
+    )
+    for certificate in certificates:
+        certificate.pk = existing.get(certificate.user_id)
+    Certificate.objects.bulk_update([c for c in certificates if c.pk], fields, batch_size=batch_size)
+    Certificate.objects.bulk_create([c for c in certificates if not c.pk], batch_size=batch_size)
+
+
+class Command(BaseCommand):
+    help = 'Renders certificates for eligible participants in parallel and records them in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', action='append', default=[], help='Only render for this username (repeatable).')
+        parser.add_argument('--team', type=int, action='append', default=[], help='Only render for members of this team id (repeatable).')
+        parser.add_argument('--force', action='store_true', help='Re-render even if the certificate is already up to date.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of render processes.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk write.')
+
+    def handle(self, *args, **options):
+        try:
+            load_assets()
+            template_version()
+        except FileNotFoundError as e:
+            raise CommandError(f"Certificate template or font file not found: {e}")
+
+        # Eligible: accepted members of teams that have made a submission.
+        members = TeamMember.objects.filter(status='accepted', team__submission__isnull=False)
+        if options['username']:
+            members = members.filter(participant__username__in=options['username'])
+        if options['team']:
+            members = members.filter(team_id__in=options['team'])
+        participants = {
+            member.participant.pk: member.participant
+            for member in members.select_related('participant').only(
+                'participant__id', 'participant__username', 'participant__first_name', 'participant__last_name'
+            )
+        }
+
+        # A certificate is up to date when it points at the content address of
+        # the participant's current name on the current template.
+        existing = dict(
+            Certificate.objects.filter(user_id__in=participants, status='ready').values_list('user_id', 'certificate_file')
+        )
+        todo = []
+        for user_id, participant in participants.items():
+            name = certificate_name(participant)
+            if not options['force'] and existing.get(user_id) == certificate_path(name):
+                continue
+            todo.append((user_id, name))
+
+        skipped = len(participants) - len(todo)
+        self.stdout.write(self.style.NOTICE(
+            f"{len(participants)} eligible participant(s): {len(todo)} to render, {skipped} already up to date."
+        ))
+        if not todo:
+            return
+
+        # Forked workers must not share the parent's database connection.
+        connections.close_all()
+        started = time.perf_counter()
+        rendered, failed = [], 0
+        with ProcessPoolExecutor(
+            max_workers=max(1, options['workers']),
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker,
+        ) as pool:
+            futures = [pool.submit(_render, *item) for item in todo]
+            for future in as_completed(futures):
+                try:
+                    rendered.append(future.result())
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f"An error occurred during certificate generation: {e}"))
+        elapsed = time.perf_counter() - started
+
+        _record(rendered, options['batch_size'])
+        caching.bump('certificate')
+
+        rate = len(rendered) / elapsed if elapsed else float('inf')
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {len(rendered)} certificate(s) in {elapsed:.2f}s ({rate:.1f} certs/sec); {failed} failed."
+        ))
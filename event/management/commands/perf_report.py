@@ -0,0 +1,43 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from event import perf
+
+
+class Command(BaseCommand):
+    help = 'Summarises per-view performance samples recorded by PerformanceMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', type=str, default=getattr(settings, 'PERF_MONITOR_LOG', None),
+                            help='JSON-lines sample log written by the middleware (defaults to PERF_MONITOR_LOG).')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+        parser.add_argument('--limit', type=int, default=None, help='Only show the N slowest views.')
+
+    def handle(self, *args, **options):
+        if not options['log']:
+            raise CommandError("No sample log given. Set PERF_MONITOR_LOG or pass --log.")
+        try:
+            rows = perf.stats_from_log(options['log']).report()
+        except FileNotFoundError:
+            raise CommandError(f"File not found at {options['log']}")
+        if options['limit']:
+            rows = rows[:options['limit']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+
+        self.stdout.write(self.style.NOTICE(
+            f"{'view':<32} {'reqs':>6} {'avg q':>7} {'max q':>6} {'dup q':>6} {'sql ms':>8} {'tpl ms':>8} {'avg ms':>8} {'max ms':>8}"
+        ))
+        for row in rows:
+            line = (
+                f"{row['view'][:32]:<32} {row['requests']:>6} {row['avg_queries']:>7} {row['max_queries']:>6} "
+                f"{row['avg_duplicate_queries']:>6} {row['avg_sql_ms']:>8} {row['avg_template_ms']:>8} "
+                f"{row['avg_total_ms']:>8} {row['max_total_ms']:>8}"
+            )
+            self.stdout.write(self.style.WARNING(line) if row['avg_duplicate_queries'] >= 5 else line)
+            if row['worst_duplicate_sql']:
+                self.stdout.write(f"    repeated {row['worst_duplicate_count']}x: {row['worst_duplicate_sql'][:120]}")
@@ -0,0 +1,35 @@
+import gzip
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from event import notifications
+
+
+class Command(BaseCommand):
+    help = 'Deletes read notifications older than a number of days, in batches, optionally archiving them first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Delete read notifications older than this many days.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per transaction.')
+        parser.add_argument('--archive', type=str, default=None,
+                            help='Append the deleted rows to this file as JSON lines (gzipped if it ends in .gz).')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must be >= 0 and --batch-size >= 1.')
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        self.stdout.write(self.style.NOTICE(f"Pruning read notifications created before {cutoff:%Y-%m-%d %H:%M}."))
+
+        path = options['archive']
+        if path is None:
+            deleted = notifications.prune_read(cutoff, options['batch_size'])
+        else:
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'at', encoding='utf-8') as archive:
+                deleted = notifications.prune_read(cutoff, options['batch_size'], archive)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} notification(s)" + (f", archived to {path}." if path else ".")
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from event import leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the leaderboard snapshot from all judging scores'
+
+    def handle(self, *args, **options):
+        count = leaderboard.refresh()
+        self.stdout.write(self.style.SUCCESS(f"Leaderboard rebuilt with {count} scored submission(s)."))
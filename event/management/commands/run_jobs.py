@@ -0,0 +1,64 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from event import jobs
+
+
+def _worker(stop_when_empty, poll_interval, stop_event):
+    # Let the parent decide when to stop; a Ctrl+C reaches every process in the group.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        return jobs.work(
+            stop_when_empty=stop_when_empty,
+            poll_interval=poll_interval,
+            should_stop=stop_event.is_set,
+        )
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (certificate rendering, etc.) from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes to run.')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty instead of polling.')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty.')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        burst = options['burst']
+        poll_interval = options['poll_interval']
+        self.stdout.write(self.style.NOTICE(f"Starting {processes} job worker(s){' in burst mode' if burst else ''}."))
+
+        if processes == 1:
+            try:
+                processed = jobs.work(stop_when_empty=burst, poll_interval=poll_interval)
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING("Interrupted."))
+                return
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)."))
+            return
+
+        # Forked children must not share the parent's database connection.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop_event = context.Event()
+        workers = [
+            context.Process(target=_worker, args=(burst, poll_interval, stop_event))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Stopping workers after their current job..."))
+            stop_event.set()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS("All job workers have exited."))
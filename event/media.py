@@ -0,0 +1,160 @@
+"""
+Serving uploaded media (certificates, plan PDFs) to the people allowed to see it.
+
+`serve` answers conditional GETs from the file's size and modification time
+and honours single byte ranges, so a PDF viewer can fetch the pages it needs
+and a dropped download can resume. Under WSGI the bytes go out as a
+FileResponse, which the server can send with sendfile(). Under ASGI (the
+deployed uvicorn worker) Django would read a sync iterator whole before
+sending the first byte, so the file is streamed with an async iterator that
+reads one block per thread hop instead.
+
+In production set settings.MEDIA_ACCEL_REDIRECT (say '/protected-media/', an
+`internal` nginx location aliased to MEDIA_ROOT): the view then only checks
+access and hands the transfer to the proxy with an X-Accel-Redirect header,
+and nginx does ranges, conditional requests and the copying itself.
+"""
+import mimetypes
+import os
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+class _Range:
+    """
+    A file limited to `length` bytes from its current position. Keeps fileno(),
+    so a WSGI server using sendfile() still can (it sends Content-Length bytes).
+    """
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+class _AsyncBlocks:
+    """
+    Async iteration over `length` bytes of a file from its current position,
+    one BLOCK_SIZE read per worker thread hop, so an ASGI response holds one
+    block in memory rather than the whole file.
+    """
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def __aiter__(self):
+        return self._blocks()
+
+    async def _blocks(self):
+        while self.remaining > 0:
+            data = await sync_to_async(self.file.read, thread_sensitive=False)(min(BLOCK_SIZE, self.remaining))
+            if not data:
+                break
+            self.remaining -= len(data)
+            yield data
+
+    def close(self):
+        # Called by the response when it is closed, whether or not it finished.
+        self.file.close()
+
+
+def _byte_range(header, size):
+    """
+    (start, end) inclusive for a single-range Range header, None to send the
+    whole file (no header, or a form we don't handle), or False if the range
+    can't be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def serve(request, relative_path, content_type=None, filename=None, etag=None):
+    """
+    Response for the file at `relative_path` under MEDIA_ROOT. The caller has
+    already checked the user may see it. `etag` defaults to one built from the
+    file's size and modification time.
+    """
+    try:
+        path = safe_join(settings.MEDIA_ROOT, relative_path)
+        stat = os.stat(path)
+    except (ValueError, OSError):
+        raise Http404("File not found.")
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    etag = quote_etag(etag or f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        response['ETag'] = etag
+        return response
+
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT', None)
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative_path.lstrip('/')
+    else:
+        byte_range = None
+        if_range = request.headers.get('If-Range')
+        if if_range is None or if_range == etag:
+            byte_range = _byte_range(request.headers.get('Range'), stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+        start, end = byte_range or (0, stat.st_size - 1)
+        length = end - start + 1
+        file = open(path, 'rb')
+        file.seek(start)
+        status = 200 if byte_range is None else 206
+        if isinstance(request, ASGIRequest):
+            response = StreamingHttpResponse(_AsyncBlocks(file, length), status=status, content_type=content_type)
+        else:
+            body = file if byte_range is None else _Range(file, length)
+            response = FileResponse(body, status=status, content_type=content_type)
+            response.block_size = BLOCK_SIZE
+        response['Content-Length'] = length
+        if byte_range is not None:
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    if filename:
+        response['Content-Disposition'] = content_disposition_header(False, filename)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
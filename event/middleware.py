@@ -0,0 +1,93 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+from . import perf
+from .participants import Participant
+
+
+class PerformanceMiddleware:
+    """
+    Opt-in (settings.PERF_MONITOR) per-request instrumentation: query count,
+    SQL time, repeated queries, template render time and total latency,
+    aggregated per URL name in event.perf.stats.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_MONITOR', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.log_path = getattr(settings, 'PERF_MONITOR_LOG', None)
+        perf.install_template_timer()
+
+    def __call__(self, request):
+        recorder = perf.QueryRecorder()
+        token = perf.start_template_timer()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            template_seconds = perf.stop_template_timer(token)
+        total_seconds = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.view_name if match else None) or request.path
+        sample = perf.make_sample(view, recorder, template_seconds, total_seconds, response.status_code)
+        perf.stats.add(sample)
+        if self.log_path:
+            perf.append_to_log(self.log_path, sample)
+        return response
+
+
+class ParticipantMiddleware:
+    """
+    Attach `request.participant` (role, profile and team, each resolved lazily
+    and at most once per request). Must come after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # In async mode this returns get_response's coroutine for the caller to await.
+        request.participant = Participant(request.user)
+        return self.get_response(request)
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise that can also run in async mode. The stock middleware is sync
+    only, which forces Django to run the whole chain (and every async view) via
+    a worker thread; used only when settings.ASYNC_VIEWS is on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def collapse_announcement_fanout(apps, schema_editor):
+    """
+    Replace the per-user "New Announcement" notification rows with watermarks.
+    Users who had read all of them start with every existing announcement seen;
+    everyone else keeps them unread.
+    """
+    User = apps.get_model('auth', 'User')
+    Announcement = apps.get_model('event', 'Announcement')
+    Notification = apps.get_model('event', 'Notification')
+    AnnouncementWatermark = apps.get_model('event', 'AnnouncementWatermark')
+
+    legacy = Notification.objects.filter(message__startswith='New Announcement: ')
+    users_with_unread = set(legacy.filter(is_read=False).values_list('user_id', flat=True))
+    latest_id = Announcement.objects.aggregate(latest=Max('id'))['latest'] or 0
+
+    AnnouncementWatermark.objects.bulk_create(
+        [
+            AnnouncementWatermark(user_id=user_id, last_seen_announcement_id=latest_id)
+            for user_id in User.objects.values_list('id', flat=True).iterator()
+            if user_id not in users_with_unread
+        ],
+        batch_size=500,
+    )
+    legacy.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('event', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnouncementWatermark',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_seen_announcement_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(collapse_announcement_fanout, migrations.RunPython.noop),
+    ]
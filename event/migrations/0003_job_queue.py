@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_certificates_ready(apps, schema_editor):
+    Certificate = apps.get_model('event', 'Certificate')
+    Certificate.objects.exclude(certificate_file='').update(status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0002_announcementwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='certificate_file',
+            field=models.FileField(blank=True, upload_to='certificates/'),
+        ),
+        migrations.RunPython(mark_existing_certificates_ready, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_at'], name='event_job_status_eaeefa_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0003_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='rendered_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0004_certificate_rendered_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='event.submission')),
+                ('score_count', models.PositiveIntegerField(default=0)),
+                ('mean_score', models.FloatField(default=0)),
+                ('normalized_score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-normalized_score', '-mean_score'], name='event_leade_normali_c786dc_idx')],
+            },
+        ),
+    ]
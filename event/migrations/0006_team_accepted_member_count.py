@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_accepted_members(apps, schema_editor):
+    Team = apps.get_model('event', 'Team')
+    TeamMember = apps.get_model('event', 'TeamMember')
+    accepted = (
+        TeamMember.objects.filter(team=OuterRef('pk'), status='accepted')
+        .order_by().values('team').annotate(n=Count('pk')).values('n')
+    )
+    Team.objects.update(accepted_member_count=Coalesce(Subquery(accepted), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0005_leaderboardentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='accepted_member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_accepted_members, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['team_name', 'id'], name='event_team_team_na_66e26a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['selected_problem', 'accepted_member_count'], name='event_team_selecte_724ea6_idx'),
+        ),
+    ]
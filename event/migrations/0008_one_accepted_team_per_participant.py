@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_extra_memberships(apps, schema_editor):
+    """
+    Keep one accepted membership per participant (a team they lead, else the
+    earliest) and mark the rest removed, so the constraint can be added.
+    """
+    Team = apps.get_model('event', 'Team')
+    TeamMember = apps.get_model('event', 'TeamMember')
+    duplicated = (
+        TeamMember.objects.filter(status='accepted').values('participant')
+        .annotate(n=Count('pk')).filter(n__gt=1).values_list('participant', flat=True)
+    )
+    affected_teams = set()
+    for participant_id in list(duplicated):
+        memberships = list(
+            TeamMember.objects.filter(participant_id=participant_id, status='accepted').order_by('role', 'id')
+        )
+        # 'leader' sorts before 'member'.
+        for member in memberships[1:]:
+            affected_teams.add(member.team_id)
+            member.status = 'removed'
+            member.save(update_fields=['status'])
+    if affected_teams:
+        accepted = (
+            TeamMember.objects.filter(team=OuterRef('pk'), status='accepted')
+            .order_by().values('team').annotate(n=Count('pk')).values('n')
+        )
+        Team.objects.filter(pk__in=affected_teams).update(accepted_member_count=Coalesce(Subquery(accepted), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0007_notification_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_extra_memberships, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='teammember',
+            index=models.Index(fields=['team', 'status'], name='event_teamm_team_id_6e95b7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teammember',
+            index=models.Index(fields=['participant', 'status'], name='event_teamm_partici_d1c24c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='teammember',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'accepted')), fields=('participant',), name='one_accepted_team_per_participant'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:28
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0008_one_accepted_team_per_participant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('size', models.PositiveIntegerField()),
+                ('received', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='event.team')),
+            ],
+        ),
+    ]
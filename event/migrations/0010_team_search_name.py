@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:46
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0009_planupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='search_name',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Lower('team_name'), output_field=models.CharField(max_length=255)),
+        ),
+    ]
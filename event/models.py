@@ -1,5 +1,10 @@
+import uuid
+
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # --- Section 1: User and Profile Management ---
 class UserProfile(models.Model):
@@ -95,11 +100,29 @@ class Team(models.Model):
     leader = models.ForeignKey(User, related_name='led_teams', on_delete=models.CASCADE)
     selected_problem = models.ForeignKey(ProblemStatement, on_delete=models.SET_NULL, null=True, blank=True, related_name='teams_working_on')
     max_size = models.IntegerField(default=6)
+    # Maintained by signals in event/signals.py; see event/teams.py.
+    accepted_member_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Lowercased name for the team browser's prefix search. On PostgreSQL the
+    # index comes with a varchar_pattern_ops twin, which serves LIKE 'abc%'.
+    search_name = models.GeneratedField(
+        expression=Lower('team_name'), output_field=models.CharField(max_length=255), db_persist=True, db_index=True
+    )
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the team list walks this index in order.
+            models.Index(fields=['team_name', 'id']),
+            models.Index(fields=['selected_problem', 'accepted_member_count']),
+        ]
 
     def __str__(self):
         return self.team_name
 
+    @property
+    def open_slots(self):
+        return max(self.max_size - self.accepted_member_count, 0)
+
 class TeamMember(models.Model):
     ROLE_CHOICES = [('leader', 'Leader'), ('member', 'Member')]
     STATUS_CHOICES = [('pending', 'Pending'), ('accepted', 'Accepted'), ('rejected', 'Rejected'), ('removed', 'Removed')]
@@ -112,10 +135,28 @@ class TeamMember(models.Model):
 
     class Meta:
         unique_together = ('team', 'participant')
+        constraints = [
+            # A participant is on at most one team; see event/teams.py.
+            models.UniqueConstraint(
+                fields=['participant'], condition=models.Q(status='accepted'), name='one_accepted_team_per_participant'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['team', 'status']),
+            models.Index(fields=['participant', 'status']),
+        ]
 
     def __str__(self):
         return f"{self.participant.username} in {self.team.team_name}"
 
+    def clean(self):
+        from .teams import TeamFull, check_capacity
+
+        try:
+            check_capacity(self)
+        except TeamFull:
+            raise ValidationError({'status': "This team is already full."})
+
 class TeamInvite(models.Model):
     STATUS_CHOICES = [('pending', 'Pending'), ('accepted', 'Accepted'), ('declined', 'Declined')]
 
@@ -142,6 +183,20 @@ class Submission(models.Model):
     def __str__(self):
         return f"{self.project_title or 'Untitled'} by {self.team.team_name}"
 
+class PlanUpload(models.Model):
+    """
+    A plan PDF being uploaded in chunks (see event/uploads.py). The bytes go to
+    a partial file under MEDIA_ROOT/plans/partial/ until the last one arrives.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    team = models.ForeignKey(Team, on_delete=models.CASCADE)
+    size = models.PositiveIntegerField()
+    received = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Plan upload for {self.team.team_name} ({self.received}/{self.size} bytes)"
+
 class JudgingScore(models.Model):
     judge = models.ForeignKey(User, on_delete=models.CASCADE)
     submission = models.ForeignKey(Submission, on_delete=models.CASCADE)
@@ -151,6 +206,23 @@ class JudgingScore(models.Model):
     class Meta:
         unique_together = ('judge', 'submission')
 
+class LeaderboardEntry(models.Model):
+    """
+    Materialised ranking row for a scored submission, maintained by event/leaderboard.py.
+    `normalized_score` is the mean of per-judge z-scores.
+    """
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, primary_key=True)
+    score_count = models.PositiveIntegerField(default=0)
+    mean_score = models.FloatField(default=0)
+    normalized_score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-normalized_score', '-mean_score'])]
+
+    def __str__(self):
+        return f"Leaderboard entry for {self.submission_id}"
+
 # --- Section 4: Communication & Certificates ---
 class Announcement(models.Model):
     title = models.CharField(max_length=255)
@@ -166,13 +238,61 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Unread counts.
+            models.Index(fields=['user', 'is_read', 'created_at']),
+            # Keyset pagination of the inbox walks this index in order.
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user.username}"
 
+class AnnouncementWatermark(models.Model):
+    """
+    Announcements are stored once and shared by everyone; this row remembers the
+    newest announcement a user has already seen, so anything above it is unread.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    last_seen_announcement_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Announcements seen by {self.user.username}"
+
 class Certificate(models.Model):
+    STATUS_CHOICES = [('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')]
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    certificate_file = models.FileField(upload_to='certificates/')
+    certificate_file = models.FileField(upload_to='certificates/', blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # The name drawn on the image, so a later rename can be detected as stale.
+    rendered_name = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Certificate for {self.user.username}"
\ No newline at end of file
+        return f"Certificate for {self.user.username}"
+
+# --- Section 5: Background Jobs ---
+class Job(models.Model):
+    """
+    A unit of deferred work picked up by `manage.py run_jobs`.
+    Handlers are registered by name in event/jobs.py.
+    """
+    STATUS_CHOICES = [('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
\ No newline at end of file
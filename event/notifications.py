@@ -0,0 +1,242 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+
+from . import caching
+from .models import Announcement, AnnouncementWatermark, Notification
+
+# With a shared cache, counters live there and are adjusted in place when
+# notifications change. A per-process cache (LocMemCache) is not used: only the
+# worker that made a change would adjust its copy, and users routed to the
+# others would see a wrong badge. Without one the count is read from the
+# database each time, through the (user, is_read) index.
+CACHE_TIMEOUT = 60
+ANNOUNCEMENTS_CACHE_KEY = 'notifications:announcements'
+
+
+def _unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _watermark_key(user_id):
+    return f'notifications:watermark:{user_id}'
+
+
+def _announcement_message(announcement):
+    return f"New Announcement: {announcement.title}"
+
+
+def _visible_announcements(user):
+    """
+    Announcements are broadcast, so a user only sees the ones posted after they joined
+    (the same set they would have received a personal notification for).
+    """
+    return Announcement.objects.filter(created_at__gte=user.date_joined)
+
+
+def _cached(key, load):
+    if not caching.cache_is_shared():
+        return load()
+    return cache.get_or_set(key, load, CACHE_TIMEOUT)
+
+
+def _announcement_index():
+    """
+    (id, created_at) of every announcement; small, shared by all users and
+    dropped whenever an announcement is saved or deleted.
+    """
+    return _cached(ANNOUNCEMENTS_CACHE_KEY, lambda: list(Announcement.objects.values_list('id', 'created_at')))
+
+
+def _last_seen_announcement_id(user):
+    def load():
+        watermark = AnnouncementWatermark.objects.filter(user=user).values_list('last_seen_announcement_id', flat=True).first()
+        return watermark or 0
+    return _cached(_watermark_key(user.pk), load)
+
+
+def _personal_unread_count(user):
+    return _cached(_unread_key(user.pk), lambda: Notification.objects.filter(user=user, is_read=False).count())
+
+
+def unread_count(user):
+    """
+    Number of unread personal notifications plus announcements above the user's watermark.
+    Served from a shared cache, where the database is only hit when a counter has
+    expired; read from the database otherwise.
+    """
+    last_seen = _last_seen_announcement_id(user)
+    broadcast = sum(
+        1 for announcement_id, created_at in _announcement_index()
+        if announcement_id > last_seen and created_at >= user.date_joined
+    )
+    return _personal_unread_count(user) + broadcast
+
+
+def cached_unread_count(user):
+    """
+    `unread_count` from cached values only, or None if any of them has expired
+    or the cache isn't shared. Never queries the database, so it is safe to
+    call from async code.
+    """
+    if not caching.cache_is_shared():
+        return None
+    keys = [_unread_key(user.pk), _watermark_key(user.pk), ANNOUNCEMENTS_CACHE_KEY]
+    values = cache.get_many(keys)
+    if len(values) < len(keys):
+        return None
+    broadcast = sum(
+        1 for announcement_id, created_at in values[ANNOUNCEMENTS_CACHE_KEY]
+        if announcement_id > values[_watermark_key(user.pk)] and created_at >= user.date_joined
+    )
+    return values[_unread_key(user.pk)] + broadcast
+
+
+def notification_created(notification):
+    """
+    Bump the cached counter for a new unread notification. A missing counter is
+    left alone and rebuilt from the database on next read.
+    """
+    if notification.is_read or not caching.cache_is_shared():
+        return
+    try:
+        cache.incr(_unread_key(notification.user_id))
+    except ValueError:
+        pass
+
+
+def notification_changed(notification):
+    cache.delete(_unread_key(notification.user_id))
+
+
+def announcements_changed():
+    cache.delete(ANNOUNCEMENTS_CACHE_KEY)
+
+
+PAGE_SIZE = 20
+# Sort rank among items created at the same instant: announcements come first.
+_NOTIFICATION, _ANNOUNCEMENT = 0, 1
+
+
+def _sort_key(item):
+    if isinstance(item, dict):
+        return (item['created_at'], _ANNOUNCEMENT, item['id'])
+    return (item.created_at, _NOTIFICATION, item.pk)
+
+
+def encode_cursor(item):
+    created_at, rank, pk = _sort_key(item)
+    raw = json.dumps([created_at.isoformat(), rank, pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    (created_at, rank, id) from a cursor, or None if it is missing or malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        created_at, rank, pk = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        created_at = datetime.fromisoformat(created_at)
+        return created_at, int(rank), int(pk)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def _older_than(position, rank):
+    """
+    Rows of the given rank that sort after `position` in newest-first order.
+    """
+    created_at, position_rank, pk = position
+    condition = Q(created_at__lt=created_at)
+    if rank < position_rank:
+        condition |= Q(created_at=created_at)
+    elif rank == position_rank:
+        condition |= Q(created_at=created_at, pk__lt=pk)
+    return condition
+
+
+def inbox_page(user, cursor=None, limit=PAGE_SIZE):
+    """
+    One page of the user's inbox, newest first: personal notifications merged
+    with the broadcast announcements they can see. Returns (items, next_cursor);
+    next_cursor is None on the last page. Each source is read by keyset, at most
+    limit + 1 rows, so a page costs the same however long the inbox is.
+    Announcements are returned as dicts with the same keys the template reads from a Notification.
+    """
+    last_seen = _last_seen_announcement_id(user)
+    position = decode_cursor(cursor)
+    notifications = Notification.objects.filter(user=user)
+    announcements = _visible_announcements(user).only('id', 'title', 'created_at')
+    if position is not None:
+        notifications = notifications.filter(_older_than(position, _NOTIFICATION))
+        announcements = announcements.filter(_older_than(position, _ANNOUNCEMENT))
+
+    items = list(notifications.order_by('-created_at', '-id')[:limit + 1])
+    for announcement in announcements.order_by('-created_at', '-id')[:limit + 1]:
+        items.append({
+            'id': announcement.id,
+            'message': _announcement_message(announcement),
+            'is_read': announcement.id <= last_seen,
+            'created_at': announcement.created_at,
+        })
+    items.sort(key=_sort_key, reverse=True)
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+
+def mark_read(user, items):
+    """
+    Mark the inbox items the user has just been shown as read: their unread
+    personal notifications, and announcements up to the newest one shown (the
+    watermark can only say "everything up to here").
+    """
+    notification_ids = [item.pk for item in items if not isinstance(item, dict) and not item.is_read]
+    announcement_ids = [item['id'] for item in items if isinstance(item, dict) and not item['is_read']]
+    if notification_ids:
+        Notification.objects.filter(pk__in=notification_ids, is_read=False).update(is_read=True)
+        cache.delete(_unread_key(user.pk))
+    if announcement_ids:
+        latest_id = max(announcement_ids)
+        _, created = AnnouncementWatermark.objects.get_or_create(
+            user=user, defaults={'last_seen_announcement_id': latest_id}
+        )
+        # The watermark only moves forward; leave the cached one alone when it didn't move.
+        if created or AnnouncementWatermark.objects.filter(
+            user=user, last_seen_announcement_id__lt=latest_id
+        ).update(last_seen_announcement_id=latest_id):
+            cache.set(_watermark_key(user.pk), latest_id, CACHE_TIMEOUT)
+
+
+
+def prune_read(older_than, batch_size=1000, archive=None):
+    """
+    Delete read notifications created before `older_than`, `batch_size` rows per
+    transaction so the table is never locked for long. With `archive` (a text
+    file), each row is first written to it as a JSON line. Returns the number of
+    rows deleted.
+
+    Batches are taken in primary key order, which follows creation time, so each
+    one is found near the start of the index instead of by a full scan.
+    """
+    old = Notification.objects.filter(is_read=True, created_at__lt=older_than).order_by('pk')
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            rows = list(old.values('id', 'user_id', 'message', 'created_at')[:batch_size])
+            if not rows:
+                return deleted
+            if archive is not None:
+                for row in rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            Notification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        deleted += len(rows)
+        if len(rows) < batch_size:
+            return deleted
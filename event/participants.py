@@ -0,0 +1,97 @@
+"""
+Who is making the request: role, profile and current team.
+
+`event.middleware.ParticipantMiddleware` puts a `Participant` on every request
+as `request.participant`, and the `participant` context processor hands the
+same object to templates, so a page resolves each of these at most once.
+
+When CACHES points at a shared backend (Redis, Memcached, the database), the
+role and team id are also kept there for CACHE_TIMEOUT seconds, so role checks
+and "am I on a team?" checks usually cost no queries at all. Signals (see
+event/signals.py) drop the cached entry whenever the user's profile or team
+membership changes. A per-process cache (LocMemCache) is not used: the signal
+would only clear it in the worker that made the change, and the others would
+keep authorising with a stale role or team.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.utils.functional import cached_property
+
+from . import caching, teams
+from .models import TeamMember, UserProfile
+
+CACHE_TIMEOUT = 60
+
+
+def _cache_key(user_id):
+    return f'participant:{user_id}'
+
+
+def forget(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+class Participant:
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def _summary(self):
+        """
+        (role, team_id) from the shared cache, resolving and storing it on a miss.
+        """
+        if not self.user.is_authenticated:
+            return (None, None)
+        shared = caching.cache_is_shared()
+        key = _cache_key(self.user.pk)
+        summary = cache.get(key) if shared else None
+        if summary is None:
+            # Role and team id in one query, without loading either row.
+            team_ids = TeamMember.objects.filter(participant=OuterRef('pk'), status='accepted').values('team_id')[:1]
+            summary = tuple(
+                User.objects.filter(pk=self.user.pk)
+                .values_list('userprofile__user_role', Subquery(team_ids))
+                .first() or (None, None)
+            )
+            if shared:
+                cache.set(key, summary, CACHE_TIMEOUT)
+        return summary
+
+    @cached_property
+    def profile(self):
+        """
+        The user's UserProfile, or None. Read through `user.userprofile` so
+        code that still uses that relation gets the same cached instance.
+        """
+        if not self.user.is_authenticated:
+            return None
+        try:
+            return self.user.userprofile
+        except UserProfile.DoesNotExist:
+            return None
+
+    @cached_property
+    def membership(self):
+        """
+        The user's accepted TeamMember row, with the team, its leader and submission joined in, or None.
+        """
+        if not self.user.is_authenticated:
+            return None
+        return teams.membership(self.user)
+
+    @property
+    def role(self):
+        return self._summary[0]
+
+    @property
+    def team_id(self):
+        return self._summary[1]
+
+    @property
+    def on_team(self):
+        return self.team_id is not None
+
+    @property
+    def team(self):
+        return self.membership.team if self.membership else None
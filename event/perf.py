@@ -0,0 +1,172 @@
+"""
+Per-view performance statistics.
+
+`event.middleware.PerformanceMiddleware` records one sample per request
+(query count, SQL time, duplicated queries, template time, total time) and
+adds it to the in-process `stats` aggregator, keyed by URL name. Samples can
+also be appended to a JSON-lines log so `manage.py perf_report` can summarise
+them from another process.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.template.backends.django import Template as DjangoTemplate
+
+# Template time for the request currently being handled, in seconds.
+_template_time = ContextVar('perf_template_time', default=None)
+
+
+class QueryRecorder:
+    """
+    A database execute wrapper that times every query and remembers its SQL
+    (without parameters, so the same query with different ids counts as a repeat).
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return self.count - len(self.statements)
+
+    def most_repeated(self):
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+
+def start_template_timer():
+    return _template_time.set(0.0)
+
+
+def stop_template_timer(token):
+    elapsed = _template_time.get() or 0.0
+    _template_time.reset(token)
+    return elapsed
+
+
+_original_render = DjangoTemplate.render
+
+
+def _timed_render(self, context=None, request=None):
+    if _template_time.get() is None:
+        return _original_render(self, context, request)
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        _template_time.set(_template_time.get() + time.perf_counter() - started)
+
+
+def install_template_timer():
+    DjangoTemplate.render = _timed_render
+
+
+def make_sample(view, recorder, template_seconds, total_seconds, status_code):
+    sql, repeats = recorder.most_repeated()
+    return {
+        'view': view,
+        'status': status_code,
+        'queries': recorder.count,
+        'duplicate_queries': recorder.duplicates,
+        'most_repeated_sql': sql if repeats > 1 else None,
+        'most_repeated_count': repeats if repeats > 1 else 0,
+        'sql_ms': round(recorder.duration * 1000, 3),
+        'template_ms': round(template_seconds * 1000, 3),
+        'total_ms': round(total_seconds * 1000, 3),
+    }
+
+
+class PerfStats:
+    """
+    Thread-safe aggregate of samples per view.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def add(self, sample):
+        with self._lock:
+            view = self._views.setdefault(sample['view'], {
+                'requests': 0,
+                'queries': 0,
+                'max_queries': 0,
+                'duplicate_queries': 0,
+                'sql_ms': 0.0,
+                'template_ms': 0.0,
+                'total_ms': 0.0,
+                'max_total_ms': 0.0,
+                'worst_duplicate_sql': None,
+                'worst_duplicate_count': 0,
+            })
+            view['requests'] += 1
+            view['queries'] += sample['queries']
+            view['max_queries'] = max(view['max_queries'], sample['queries'])
+            view['duplicate_queries'] += sample['duplicate_queries']
+            view['sql_ms'] += sample['sql_ms']
+            view['template_ms'] += sample['template_ms']
+            view['total_ms'] += sample['total_ms']
+            view['max_total_ms'] = max(view['max_total_ms'], sample['total_ms'])
+            if sample['most_repeated_count'] > view['worst_duplicate_count']:
+                view['worst_duplicate_sql'] = sample['most_repeated_sql']
+                view['worst_duplicate_count'] = sample['most_repeated_count']
+
+    def report(self):
+        """
+        Per-view averages, slowest (by mean latency) first.
+        """
+        with self._lock:
+            rows = []
+            for name, view in self._views.items():
+                n = view['requests']
+                rows.append({
+                    'view': name,
+                    'requests': n,
+                    'avg_queries': round(view['queries'] / n, 2),
+                    'max_queries': view['max_queries'],
+                    'avg_duplicate_queries': round(view['duplicate_queries'] / n, 2),
+                    'avg_sql_ms': round(view['sql_ms'] / n, 3),
+                    'avg_template_ms': round(view['template_ms'] / n, 3),
+                    'avg_total_ms': round(view['total_ms'] / n, 3),
+                    'max_total_ms': view['max_total_ms'],
+                    'worst_duplicate_sql': view['worst_duplicate_sql'],
+                    'worst_duplicate_count': view['worst_duplicate_count'],
+                })
+        return sorted(rows, key=lambda row: row['avg_total_ms'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+stats = PerfStats()
+
+_log_lock = threading.Lock()
+
+
+def append_to_log(path, sample):
+    line = json.dumps(sample)
+    with _log_lock, open(path, 'a', encoding='utf-8') as log:
+        log.write(line + '\n')
+
+
+def stats_from_log(path):
+    aggregate = PerfStats()
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            if line.strip():
+                aggregate.add(json.loads(line))
+    return aggregate
@@ -0,0 +1,96 @@
+"""
+Event schedule, grouped by day.
+
+All items and their details are read in one query, grouped in Python for any
+number of days and cached until a ScheduleItem or ScheduleDetail changes (see
+event/signals.py), or only for a few seconds when the cache is per-process
+and the change can't reach the other workers. The cached entry carries its own ETag so the JSON endpoint
+can answer polling clients without touching the database.
+"""
+import hashlib
+import json
+from datetime import datetime
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import caching
+from .models import ScheduleDetail, ScheduleItem
+
+SCHEDULE_CACHE_KEY = 'schedule:days'
+# Invalidated explicitly on every change; the timeout is a backstop.
+SCHEDULE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _day_order(day):
+    """
+    Sort key for a day label: the order of ScheduleItem.DAY_CHOICES, then any
+    other labels alphabetically after them.
+    """
+    labels = [choice for choice, _ in ScheduleItem.DAY_CHOICES]
+    if day in labels:
+        return (0, labels.index(day), '')
+    return (1, 0, day)
+
+
+def _day_date(day):
+    """
+    The calendar date in a label such as 'Day 1: Sep 25, 2025', or None.
+    """
+    try:
+        return datetime.strptime(day.rsplit(':', 1)[-1].strip(), '%b %d, %Y').date()
+    except ValueError:
+        return None
+
+
+def _item(item):
+    try:
+        details = item.scheduledetail.details
+    except ScheduleDetail.DoesNotExist:
+        details = ''
+    return {
+        'id': item.pk,
+        'title': item.title,
+        'start_time': item.start_time,
+        'end_time': item.end_time,
+        'time_display_override': item.time_display_override or '',
+        'details': details,
+    }
+
+
+def build():
+    """
+    Read the whole schedule in one query and group it by day.
+    """
+    grouped = {}
+    for item in ScheduleItem.objects.select_related('scheduledetail').order_by('start_time', 'id'):
+        grouped.setdefault(item.day, []).append(_item(item))
+    return [
+        {'day': day, 'date': _day_date(day), 'items': grouped[day]}
+        for day in sorted(grouped, key=_day_order)
+    ]
+
+
+def to_json(days):
+    return json.dumps({'days': days}, cls=DjangoJSONEncoder)
+
+
+def _load():
+    days = build()
+    body = to_json(days)
+    return {'days': days, 'json': body, 'etag': hashlib.sha1(body.encode()).hexdigest()}
+
+
+def get_schedule():
+    """
+    The cached schedule: {'days': [...], 'json': <serialised days>, 'etag': ...}.
+    """
+    return cache.get_or_set(SCHEDULE_CACHE_KEY, _load, caching.invalidated_timeout(SCHEDULE_CACHE_TIMEOUT))
+
+
+def days():
+    return get_schedule()['days']
+
+
+def invalidate():
+    cache.delete(SCHEDULE_CACHE_KEY)
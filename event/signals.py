@@ -1,91 +1,224 @@
-import os
-from PIL import Image, ImageDraw, ImageFont
+import weakref
 
-from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 
+from . import caching, leaderboard, live, notifications, participants, schedule, teams
+from .certificates import queue_certificates
 from .models import (
-    Announcement, Notification, Submission, TeamMember, Certificate, UserProfile
+    FAQ, Announcement, Certificate, JudgingScore, Notification, ProblemStatement, ScheduleDetail, ScheduleItem,
+    Submission, Team, TeamMember, UserProfile
 )
 
-@receiver(post_save, sender=Announcement)
-def create_notification_for_announcement(sender, instance, created, **kwargs):
+
+class _CommitBatch:
+    """
+    Items collected at one savepoint level of a transaction, handed to
+    `flush(items)` in one call once it commits.
+    """
+    def __init__(self, flush):
+        self.flush = flush
+        self.items = []
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        self.flush(self.items)
+
+
+def on_commit_batch(flush, item, using=DEFAULT_DB_ALIAS):
+    """
+    Like transaction.on_commit, but every `item` added for the same `flush` at
+    the same savepoint level reaches it in a single call after the commit (at
+    once outside a transaction). Items added inside a savepoint form their own
+    batch, registered within it, so rolling the savepoint back drops them with
+    the rest of its work.
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        flush([item])
+        return
+    # Weak references: once a rollback discards a batch's commit callback, or
+    # the commit has run it, nothing else holds the batch and it drops out.
+    batches = connection.__dict__.setdefault('commit_batches', weakref.WeakValueDictionary())
+    key = (flush, tuple(connection.savepoint_ids))
+    batch = batches.get(key)
+    if batch is None or batch.done:
+        batch = batches[key] = _CommitBatch(flush)
+        transaction.on_commit(batch, using=using)
+    batch.items.append(item)
+
+
+def send_notifications(items):
+    """
+    Write queued (user_id, message) notifications with one INSERT, then do what
+    the post_save handler below does for each one saved individually.
+    """
+    created = Notification.objects.bulk_create([
+        Notification(user_id=user_id, message=message) for user_id, message in items
+    ])
+    for notification in created:
+        notifications_created(notification)
+    caching.bump(*{f'inbox:{notification.user_id}' for notification in created})
+
+
+def notify(user_id, message):
+    on_commit_batch(send_notifications, (user_id, message))
+
+
+def notifications_created(notification):
+    notifications.notification_created(notification)
+    live.notification_created(notification)
+
+# Announcements are no longer copied into a Notification per user; they are stored
+# once and merged into each inbox at read time (see event/notifications.py).
+@receiver([post_save, post_delete], sender=Announcement)
+def refresh_announcement_index(sender, instance, created=False, **kwargs):
     """
-    Create a notification for all users when a new announcement is made.
+    Drop the cached announcement index so unread counters pick up the change,
+    and push new announcements to open notification streams.
     """
+    notifications.announcements_changed()
+    caching.invalidate_home()
     if created:
-        all_users = User.objects.all()
-        for user in all_users:
-            Notification.objects.create(
-                user=user,
-                message=f"New Announcement: {instance.title}"
-            )
+        live.announcement_created(instance)
+
+@receiver([post_save, post_delete], sender=ScheduleItem)
+@receiver([post_save, post_delete], sender=ScheduleDetail)
+@receiver([post_save, post_delete], sender=FAQ)
+def refresh_home_page(sender, instance, **kwargs):
+    """
+    Drop the cached home page fragments when the schedule or FAQs change.
+    """
+    if sender is not FAQ:
+        schedule.invalidate()
+    caching.invalidate_home()
+
+@receiver(post_save, sender=Notification)
+def update_unread_counter(sender, instance, created, **kwargs):
+    """
+    Keep the cached unread counter in step with new or edited notifications,
+    and push new ones to the user's open notification streams.
+    """
+    if created:
+        notifications_created(instance)
+    else:
+        notifications.notification_changed(instance)
+    caching.bump(f'inbox:{instance.user_id}')
+
+@receiver(post_delete, sender=Notification)
+def drop_unread_counter(sender, instance, **kwargs):
+    notifications.notification_changed(instance)
+    caching.bump(f'inbox:{instance.user_id}')
+
+# Models whose changes invalidate the ETags of pages built from them.
+VERSIONED_MODELS = (
+    User, UserProfile, Team, TeamMember, Submission, JudgingScore, ProblemStatement,
+    ScheduleItem, ScheduleDetail, FAQ, Announcement, Certificate,
+)
+
+# Fields no page shows. update_last_login saves the user on every login, which
+# would otherwise change every signed-in user's ETags.
+UNDISPLAYED_FIELDS = {User: {'last_login', 'password'}}
+
+def bump_data_version(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= UNDISPLAYED_FIELDS.get(sender, set()):
+        return
+    caching.bump(sender._meta.model_name)
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_data_version, sender=model, dispatch_uid=f'bump_data_version_{model._meta.model_name}')
+    post_delete.connect(bump_data_version, sender=model, dispatch_uid=f'bump_data_version_delete_{model._meta.model_name}')
+
+@receiver([post_save, post_delete], sender=JudgingScore)
+def refresh_leaderboard(sender, instance, **kwargs):
+    """
+    Recompute the leaderboard rows affected by this judge's score once the change is committed.
+    """
+    judge_id, submission_id = instance.judge_id, instance.submission_id
+    transaction.on_commit(lambda: leaderboard.refresh_for_judge(judge_id, submission_id))
+
+def queue_certificates_for_teams(team_ids):
+    members = TeamMember.objects.filter(team_id__in=set(team_ids), status='accepted')
+    queue_certificates(members.values_list('participant_id', flat=True))
 
 @receiver(post_save, sender=Submission)
 def create_certificates_for_team(sender, instance, created, **kwargs):
     """
-    Generate a certificate for each member of a team upon their first submission.
-    This runs only when the submission object is first created.
+    Mark each member of a team as eligible for a certificate upon their first submission.
+    This runs only when the submission object is first created, once per transaction
+    for all teams that submitted in it; the images are rendered on first download
+    (or by `manage.py run_jobs`), never inside this request.
     """
     if created:
-        team = instance.team
-        team_members = TeamMember.objects.filter(team=team, status='accepted')
-
-        for member in team_members:
-            participant = member.participant
-            if not Certificate.objects.filter(user=participant).exists():
-                try:
-                    template_path = os.path.join(settings.BASE_DIR, 'static/images/certificate_template.png')
-                    image = Image.open(template_path)
-                    draw = ImageDraw.Draw(image)
-                    
-                    font_path = os.path.join(settings.BASE_DIR, 'static/fonts/Inter-Bold.ttf')
-                    font = ImageFont.truetype(font_path, 60)
-                    
-                    name = participant.get_full_name() or participant.username
-                    
-                    # Deprecated method `textlength` replaced with `font.getbbox` for modern Pillow versions
-                    text_box = draw.textbbox((0, 0), name, font=font)
-                    text_width = text_box[2] - text_box[0]
-                    position = ((image.width - text_width) / 2, 550) # Adjust Y-coordinate as needed
-                    
-                    draw.text(position, name, font=font, fill=(0, 0, 0))
-                    
-                    output_folder = os.path.join(settings.MEDIA_ROOT, 'certificates')
-                    os.makedirs(output_folder, exist_ok=True)
-                    file_path = os.path.join(output_folder, f'certificate_{participant.username}.png')
-                    image.save(file_path)
-
-                    Certificate.objects.create(
-                        user=participant,
-                        certificate_file=f'certificates/certificate_{participant.username}.png'
-                    )
-                except FileNotFoundError:
-                    print(f"Warning: Certificate template or font file not found. Could not generate certificate for {participant.username}.")
-                except Exception as e:
-                    print(f"An error occurred during certificate generation: {e}")
+        on_commit_batch(queue_certificates_for_teams, instance.team_id)
+
+
+@receiver(post_init, sender=TeamMember)
+def remember_member_state(sender, instance, **kwargs):
+    teams.remember_state(instance)
+
+@receiver(pre_save, sender=TeamMember)
+def check_team_capacity(sender, instance, **kwargs):
+    """
+    Refuse to accept a member into a full team before the row is written.
+    """
+    teams.check_capacity(instance)
 
+@receiver(post_save, sender=TeamMember)
+def update_member_count_on_save(sender, instance, **kwargs):
+    """
+    Keep Team.accepted_member_count in step when a member is accepted, removed or moved.
+    """
+    teams.member_saved(instance)
+
+@receiver(post_delete, sender=TeamMember)
+def update_member_count_on_delete(sender, instance, origin=None, **kwargs):
+    teams.member_deleted(instance, origin)
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def forget_participant_role(sender, instance, **kwargs):
+    participants.forget(instance.user_id)
+
+@receiver([post_save, post_delete], sender=TeamMember)
+def forget_participant_team(sender, instance, **kwargs):
+    """
+    Drop the cached role/team summary of a user whose membership just changed.
+    """
+    participants.forget(instance.participant_id)
+
+def _member_details(member):
+    """
+    (leader_id, team_name, username) for a TeamMember, from the relations already
+    loaded on it when both are, otherwise from a single query.
+    """
+    team_field, participant_field = TeamMember._meta.get_field('team'), TeamMember._meta.get_field('participant')
+    if team_field.is_cached(member) and participant_field.is_cached(member):
+        return member.team.leader_id, member.team.team_name, member.participant.username
+    return (
+        TeamMember.objects.filter(pk=member.pk)
+        .values_list('team__leader_id', 'team__team_name', 'participant__username')
+        .get()
+    )
 
 @receiver(post_save, sender=TeamMember)
-def notify_on_team_member_status_change(sender, instance, created, **kwargs):
+def notify_on_team_member_status_change(sender, instance, created, update_fields=None, **kwargs):
     """
-    Send notifications for team-related activities.
+    Send notifications for team-related activities. They are written after the
+    transaction commits, together with every other notification it queued.
     """
-    team = instance.team
-    participant = instance.participant
-    
+    join_requested = created and instance.status == 'pending'
+    accepted = not created and instance.status == 'accepted' and 'status' in (update_fields or [])
+    if not (join_requested or accepted):
+        return
+    leader_id, team_name, username = _member_details(instance)
+
     # Notify leader of a new join request
-    if created and instance.status == 'pending':
-        Notification.objects.create(
-            user=team.leader,
-            message=f"{participant.username} has requested to join your team, '{team.team_name}'."
-        )
-        
+    if join_requested:
+        notify(leader_id, f"{username} has requested to join your team, '{team_name}'.")
+
     # Notify participant they have been accepted
-    if not created and instance.status == 'accepted' and 'status' in (kwargs.get('update_fields') or []):
-        Notification.objects.create(
-            user=participant,
-            message=f"You have been accepted into team '{team.team_name}'!"
-        )
\ No newline at end of file
+    if accepted:
+        notify(instance.participant_id, f"You have been accepted into team '{team_name}'!")
@@ -0,0 +1,37 @@
+"""
+Static files storage for production (STORAGES['staticfiles'] when DEBUG is off).
+"""
+from django.core.files.base import ContentFile
+from whitenoise.compress import Compressor
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from . import assets
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    WhiteNoise's storage, which gives every file a content-hashed name and
+    writes .gz (and, with the brotli package installed, .br) copies of the
+    ones that compress, plus the resized image copies from event/assets.py.
+    """
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            # Build the copies first so they are hashed and listed in the manifest too.
+            for name in assets.RESPONSIVE_IMAGES:
+                if name not in paths:
+                    continue
+                source_storage, source_path = paths[name]
+                with source_storage.open(source_path) as source:
+                    variants = list(assets.render_variants(name, source))
+                for variant, data in variants:
+                    if self.exists(variant):
+                        self.delete(variant)
+                    self.save(variant, ContentFile(data))
+                    paths[variant] = (self, variant)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def create_compressor(self, **kwargs):
+        if kwargs.get('extensions') is None:
+            # AVIF is compressed already; don't spend time finding that out.
+            kwargs['extensions'] = (*Compressor.SKIP_COMPRESS_EXTENSIONS, 'avif')
+        return super().create_compressor(**kwargs)
@@ -0,0 +1,268 @@
+"""
+Team membership, membership counts and the team browser.
+
+A participant is on at most one team: the `one_accepted_team_per_participant`
+constraint allows a single accepted TeamMember row per user, so concurrent
+joins can't leave anyone on two teams. The functions below turn a violation
+into AlreadyOnTeam, and `membership` finds a user's team through the
+(participant, status) index.
+
+`Team.accepted_member_count` is adjusted by signals whenever a TeamMember row
+enters or leaves the accepted state (see event/signals.py), with a relative
+UPDATE so concurrent joins can't lose a count. Bulk writes that bypass signals
+(`bulk_create`, `QuerySet.update`) must call `recount_members` afterwards.
+
+Capacity is enforced in the same statements: a member only becomes accepted
+if the conditional UPDATE that takes a slot on the team matches a row, and a
+team only takes a problem statement while holding a row lock on that problem.
+Neither needs a lock wider than the one team or problem involved. A save that
+would accept a member into a team that is already full is refused before the
+row is written (`check_capacity`, also run by TeamMember.clean() so the admin
+shows a form error); the conditional UPDATE only decides between concurrent
+saves.
+
+`browse` pages through teams by keyset on (team_name, id), which the
+`Team(team_name, id)` index serves directly, so the cost of a page doesn't
+grow with how far into the list it is. Searching matches the start of the
+team name through the indexed `Team.search_name` column, or a whole team
+code through its unique index; a substring search could use neither.
+"""
+import base64
+import binascii
+import json
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import ProblemStatement, Team, TeamMember
+
+PAGE_SIZE = 24
+MAX_TEAMS_PER_PROBLEM = 3
+
+
+class TeamFull(Exception):
+    pass
+
+
+class ProblemFull(Exception):
+    pass
+
+
+class AlreadyOnTeam(Exception):
+    pass
+
+
+def membership(user):
+    """
+    The user's accepted TeamMember row, with the team, its leader and submission joined in, or None.
+    """
+    return (
+        TeamMember.objects.filter(participant=user, status='accepted')
+        .select_related('team__leader', 'team__submission')
+        .first()
+    )
+
+
+def recount_members(team_ids=None):
+    """
+    Recompute accepted_member_count from TeamMember rows, for `team_ids` or every team.
+    """
+    accepted = (
+        TeamMember.objects.filter(team=OuterRef('pk'), status='accepted')
+        .order_by().values('team').annotate(n=Count('pk')).values('n')
+    )
+    teams = Team.objects.all() if team_ids is None else Team.objects.filter(pk__in=team_ids)
+    return teams.update(accepted_member_count=Coalesce(Subquery(accepted), 0))
+
+
+def _counted_team(member):
+    """
+    The team this row counts towards as stored in the database, or None.
+    """
+    return member.team_id if member.status == 'accepted' else None
+
+
+def remember_state(member):
+    # Read from __dict__ so a deferred `status` doesn't cost a query per row.
+    if member.pk is None or 'status' not in member.__dict__:
+        member._counted_team_id = None if member.pk is None else False
+    else:
+        member._counted_team_id = _counted_team(member)
+
+
+def joining_team(member):
+    """
+    The id of the team saving `member` would add an accepted member to, or None.
+    """
+    before = getattr(member, '_counted_team_id', False)
+    after = _counted_team(member)
+    if before is False or before == after:
+        return None
+    return after
+
+
+def check_capacity(member):
+    """
+    Raise TeamFull, before anything is written, if saving `member` would accept
+    it into a team with no open slot.
+    """
+    team_id = joining_team(member)
+    if team_id is not None and not Team.objects.filter(pk=team_id, accepted_member_count__lt=F('max_size')).exists():
+        raise TeamFull(member.team)
+
+
+def member_saved(member):
+    before = getattr(member, '_counted_team_id', False)
+    after = _counted_team(member)
+    if before is False:
+        # State before the save is unknown (deferred field); count from scratch.
+        recount_members({team_id for team_id in (after, member.team_id) if team_id})
+    elif before != after:
+        if before is not None:
+            Team.objects.filter(pk=before).update(accepted_member_count=F('accepted_member_count') - 1)
+        if after is not None and not take_slot(after):
+            raise TeamFull(member.team)
+    member._counted_team_id = after
+
+
+def take_slot(team_id):
+    """
+    Count one more accepted member on the team unless it is already full. The
+    check and the increment are one UPDATE, so concurrent accepts can't both
+    take the last slot.
+    """
+    return Team.objects.filter(pk=team_id, accepted_member_count__lt=F('max_size')).update(
+        accepted_member_count=F('accepted_member_count') + 1
+    ) == 1
+
+
+def accept_member(member):
+    """
+    Accept a pending join request. Raises TeamFull if the team has no open slot
+    and AlreadyOnTeam if the participant has joined a team meanwhile, leaving
+    the request pending either way.
+    """
+    try:
+        with transaction.atomic():
+            member.status = 'accepted'
+            member.save(update_fields=['status', 'role'])
+    except TeamFull:
+        member.status = 'pending'
+        raise
+    except IntegrityError:
+        member.status = 'pending'
+        raise AlreadyOnTeam(member.participant_id)
+
+
+def add_member(team, participant, role='member'):
+    """
+    Add `participant` to `team` as an accepted member, reusing the row of their
+    pending request to join it, or of an earlier membership that was removed or
+    rejected. Raises TeamFull if the team has no open slot and AlreadyOnTeam if
+    the participant is on a team already.
+    """
+    try:
+        with transaction.atomic():
+            return TeamMember.objects.create(team=team, participant=participant, role=role, status='accepted')
+    except IntegrityError:
+        existing = TeamMember.objects.filter(team=team, participant=participant).exclude(status='accepted').first()
+        if existing is None:
+            raise AlreadyOnTeam(participant.pk)
+    existing.role = role
+    accept_member(existing)
+    return existing
+
+
+def create_team(team, leader):
+    """
+    Save the new `team` with `leader` as its first member. Raises AlreadyOnTeam,
+    saving nothing, if the leader is on a team already.
+    """
+    with transaction.atomic():
+        team.leader = leader
+        team.save()
+        add_member(team, leader, role='leader')
+    return team
+
+
+def request_to_join(team, participant):
+    """
+    A pending request from `participant` to join `team`. An earlier row for the
+    team is reused: a removed or rejected one becomes a new pending request.
+    """
+    member, _ = TeamMember.objects.get_or_create(
+        team=team, participant=participant, defaults={'role': 'member', 'status': 'pending'}
+    )
+    if member.status in ('removed', 'rejected'):
+        member.role, member.status = 'member', 'pending'
+        member.save(update_fields=['role', 'status'])
+    return member
+
+
+def select_problem(team, problem):
+    """
+    Point `team` at `problem` unless MAX_TEAMS_PER_PROBLEM other teams already
+    have it, in which case ProblemFull is raised. Teams choosing the same
+    problem queue on that problem's row lock; other problems are unaffected.
+    """
+    with transaction.atomic():
+        ProblemStatement.objects.select_for_update().only('pk').get(pk=problem.pk)
+        taken = Team.objects.filter(selected_problem=problem).exclude(pk=team.pk).count()
+        if taken >= MAX_TEAMS_PER_PROBLEM:
+            raise ProblemFull(problem)
+        team.selected_problem = problem
+        team.save(update_fields=['selected_problem'])
+
+
+def member_deleted(member, origin=None):
+    # Members removed along with their team have no count left to maintain.
+    if isinstance(origin, Team) or getattr(origin, 'model', None) is Team:
+        return
+    before = getattr(member, '_counted_team_id', False)
+    if before is False:
+        recount_members([member.team_id])
+    elif before is not None:
+        Team.objects.filter(pk=before, accepted_member_count__gt=0).update(
+            accepted_member_count=F('accepted_member_count') - 1
+        )
+
+
+def encode_cursor(team):
+    raw = json.dumps([team.team_name, team.pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    (team_name, id) from a cursor, or None if it is missing or malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        name, pk = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(name), int(pk)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def browse(query='', open_only=False, problem_id=None, cursor=None, limit=PAGE_SIZE):
+    """
+    One page of non-empty teams ordered by name. Returns (teams, next_cursor);
+    next_cursor is None on the last page.
+    """
+    teams = Team.objects.select_related('leader', 'selected_problem').filter(accepted_member_count__gt=0)
+    if query:
+        # Generated codes are upper case (see views.create_team).
+        teams = teams.filter(Q(search_name__startswith=query.lower()) | Q(team_code=query.upper()))
+    if open_only:
+        teams = teams.filter(accepted_member_count__lt=F('max_size'))
+    if problem_id:
+        teams = teams.filter(selected_problem_id=problem_id)
+    position = decode_cursor(cursor)
+    if position is not None:
+        name, pk = position
+        teams = teams.filter(Q(team_name__gt=name) | Q(team_name=name, pk__gt=pk))
+    page = list(teams.order_by('team_name', 'id')[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
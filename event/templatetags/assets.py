@@ -0,0 +1,43 @@
+from django import template
+from django.forms.utils import flatatt
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from event import assets
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(name, size, **attrs):
+    """
+    An <img> of the static image `name` shown `size` CSS pixels wide, wrapped in
+    a <picture> offering its AVIF and WebP copies once they are built. Keyword
+    arguments become attributes of the <img> (alt, class, loading, ...).
+
+        {% responsive_image 'images/logo.png' 32 alt="Logo" class="w-8 h-8" %}
+    """
+    srcsets = assets.srcsets(name)
+    if srcsets is None:
+        return format_html('<img src="{}"{}>', static(name), flatatt(attrs))
+    *sources, (_, fallback_srcset) = srcsets
+    sizes = f'{size}px'
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', (
+            (content_type, srcset, sizes) for content_type, srcset in sources
+        )),
+        assets.variant_url(name, size, 'png'),
+        fallback_srcset,
+        sizes,
+        flatatt(attrs),
+    )
+
+
+@register.simple_tag
+def image_variant(name, width, extension='png'):
+    """
+    URL of a copy of the static image `name` at least `width` pixels wide, for
+    places a srcset can't go (e.g. the favicon); the original until built.
+    """
+    return assets.variant_url(name, width, extension)
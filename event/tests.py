@@ -1,3 +1,1495 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import time as clock, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageFont
+
+from .models import (
+    FAQ, Announcement, AnnouncementWatermark, Certificate, Job, JudgingScore, LeaderboardEntry, Notification,
+    PlanUpload, ProblemStatement, ScheduleDetail, ScheduleItem, Submission, Team, TeamInvite, TeamMember, UserProfile
+)
+from . import (
+    assets, caching, certificates, exports, jobs, leaderboard, live, media, participants, perf, schedule, teams,
+    uploads, views
+)
+from . import notifications as inbox
+from .async_views import use_async_views
+from .context_processors import unread_notifications_count
+from .management.commands import generate_certificates
+from .signals import notify
+from .teams import browse, recount_members
+
+# Render-time ceiling for any single request, in milliseconds. Generous on
+# purpose: the query budgets catch N+1s, this only catches pathological pages.
+MAX_RENDER_MS = 1500
+
+
+class EventFactory:
+    """
+    Builds a realistic event with bulk inserts: participants in full teams,
+    submissions, a score from every judge, notifications and site content.
+    """
+    def __init__(self, teams=40, team_size=5, loners=20, judges=5, organizers=2):
+        self.password = make_password('password')
+        self.team_count = teams
+        self.team_size = team_size
+        self.loner_count = loners
+        self.judge_count = judges
+        self.organizer_count = organizers
+
+    def _users(self, prefix, count, role):
+        User.objects.bulk_create([
+            User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', first_name=prefix.title(),
+                 last_name=str(i), password=self.password)
+            for i in range(count)
+        ])
+        users = list(User.objects.filter(username__startswith=prefix).order_by('id'))
+        UserProfile.objects.bulk_create([UserProfile(user=user, user_role=role) for user in users])
+        return users
+
+    def build(self):
+        participants = self._users('participant', self.team_count * self.team_size + self.loner_count, 'participant')
+        judges = self._users('judge', self.judge_count, 'judge')
+        organizers = self._users('organizer', self.organizer_count, 'organizer')
+        staff = User.objects.create(username='staff', is_staff=True, password=self.password)
+
+        problems = ProblemStatement.objects.bulk_create([
+            ProblemStatement(title=f'Problem {i}', description='Build something useful.') for i in range(15)
+        ])
+
+        leaders = participants[:self.team_count * self.team_size:self.team_size]
+        Team.objects.bulk_create([
+            Team(team_name=f'Team {i}', team_code=f'CODE{i:04d}', leader=leader,
+                 selected_problem=problems[i % len(problems)] if i < 30 else None)
+            for i, leader in enumerate(leaders)
+        ])
+        teams = list(Team.objects.order_by('id'))
+
+        members = []
+        for i, team in enumerate(teams):
+            for j, participant in enumerate(participants[i * self.team_size:(i + 1) * self.team_size]):
+                members.append(TeamMember(team=team, participant=participant, role='leader' if j == 0 else 'member'))
+        loners = participants[self.team_count * self.team_size:]
+        members += [TeamMember(team=teams[0], participant=loner, role='member', status='pending') for loner in loners[:5]]
+        TeamMember.objects.bulk_create(members)
+        recount_members()
+        teams = list(Team.objects.order_by('id'))
+        TeamInvite.objects.bulk_create([TeamInvite(team=teams[1], invited_email=loner.email) for loner in loners[5:10]])
+
+        Submission.objects.bulk_create([
+            Submission(team=team, problem_statement=team.selected_problem, project_title=f'Project {i}',
+                       ideation_text='An idea.', repo_link='https://example.com/repo')
+            for i, team in enumerate(teams[:30])
+        ])
+        submissions = list(Submission.objects.order_by('id'))
+        JudgingScore.objects.bulk_create([
+            JudgingScore(judge=judge, submission=submission, score=Decimal(50 + (i * 7 + j * 3) % 50))
+            for i, submission in enumerate(submissions)
+            for j, judge in enumerate(judges)
+        ])
+
+        Announcement.objects.bulk_create([Announcement(title=f'News {i}', message='Hello.') for i in range(5)])
+        Notification.objects.bulk_create([
+            Notification(user=user, message=f'Message {k}', is_read=k > 0)
+            for user in participants + judges
+            for k in range(3)
+        ])
+        FAQ.objects.bulk_create([FAQ(question=f'Question {i}?', answer='Answer.') for i in range(10)])
+        days = [choice for choice, _ in ScheduleItem.DAY_CHOICES]
+        ScheduleItem.objects.bulk_create([
+            ScheduleItem(day=days[i % 3], start_time=clock(9 + i // 3), title=f'Session {i}') for i in range(18)
+        ])
+        ScheduleDetail.objects.bulk_create([
+            ScheduleDetail(schedule_item=item, details='Details.') for item in ScheduleItem.objects.all()[:6]
+        ])
+
+        return {
+            'participants': participants,
+            'loners': loners,
+            'judges': judges,
+            'organizers': organizers,
+            'staff': staff,
+            'teams': teams,
+            'submissions': submissions,
+            'problems': problems,
+        }
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(TestCase):
+    """
+    Every URL, as every role that can use it, must stay within a fixed number of
+    queries regardless of how many teams, members or submissions exist.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = EventFactory().build()
+        cls.leader = cls.data['teams'][0].leader
+        cls.member = TeamMember.objects.filter(team=cls.data['teams'][0], role='member', status='accepted').first().participant
+        cls.loner = cls.data['loners'][-1]
+        cls.invited = cls.data['loners'][5]
+        cls.judge = cls.data['judges'][0]
+        cls.organizer = cls.data['organizers'][0]
+        cls.staff = cls.data['staff']
+
+    def setUp(self):
+        # Measure the cold path; cached counters must not hide queries.
+        cache.clear()
+
+    def assertWithinBudget(self, user, url, max_queries, method='get', data=None, status=(200, 302)):
+        if user is not None:
+            self.client.force_login(user)
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data or {})
+            if response.streaming:
+                b''.join(response.streaming_content)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.assertIn(response.status_code, status, f"{method.upper()} {url} returned {response.status_code}")
+        self.assertLessEqual(
+            len(queries), max_queries,
+            f"{method.upper()} {url} ran {len(queries)} queries (budget {max_queries}):\n"
+            + "\n".join(query['sql'] for query in queries.captured_queries),
+        )
+        self.assertLess(elapsed_ms, MAX_RENDER_MS, f"{method.upper()} {url} took {elapsed_ms:.0f}ms")
+        return response
+
+    # --- Public pages ---
+    def test_home_anonymous(self):
+        self.assertWithinBudget(None, reverse('home'), 5)
+
+    def test_home_anonymous_cached(self):
+        self.client.get(reverse('home'))
+        self.assertWithinBudget(None, reverse('home'), 0)
+        FAQ.objects.create(question='Is it cached?', answer='Not any more.')
+        response = self.assertWithinBudget(None, reverse('home'), 5)
+        self.assertContains(response, 'Is it cached?')
+
+    def test_home_cache_timeout(self):
+        for shared, timeout in ((False, caching.LOCAL_CACHE_TIMEOUT), (True, caching.HOME_CACHE_TIMEOUT)):
+            cache.clear()
+            with mock.patch.object(caching, 'cache_is_shared', return_value=shared), \
+                    mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+                self.client.get(reverse('home'))
+            # The anonymous page and both fragments.
+            home_sets = [call.args for call in cache_set.call_args_list
+                         if call.args[0] == caching.HOME_PAGE_KEY or call.args[0].startswith('template.cache.home_')]
+            self.assertEqual(len(home_sets), 3)
+            self.assertEqual({args[2] for args in home_sets}, {timeout})
+
+    def test_schedule_cache_timeout(self):
+        for shared, timeout in ((False, caching.LOCAL_CACHE_TIMEOUT), (True, schedule.SCHEDULE_CACHE_TIMEOUT)):
+            cache.clear()
+            with mock.patch.object(caching, 'cache_is_shared', return_value=shared), \
+                    mock.patch.object(cache, 'get_or_set', wraps=cache.get_or_set) as get_or_set:
+                self.client.get(reverse('schedule_json'))
+            timeouts = {call.args[2] for call in get_or_set.call_args_list if call.args[0] == schedule.SCHEDULE_CACHE_KEY}
+            self.assertEqual(timeouts, {timeout})
+
+    def test_home_participant(self):
+        self.assertWithinBudget(self.member, reverse('home'), 10)
+
+    def test_schedule_json(self):
+        url = reverse('schedule_json')
+        response = self.assertWithinBudget(None, url, 1)
+        days = response.json()['days']
+        self.assertEqual([day['day'] for day in days], [choice for choice, _ in ScheduleItem.DAY_CHOICES])
+        self.assertEqual(sum(len(day['items']) for day in days), 18)
+        self.assertEqual(days[0]['date'], '2025-09-25')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        item = ScheduleItem.objects.create(day='Closing: Sep 28, 2025', start_time=clock(18), title='Awards')
+        ScheduleDetail.objects.create(schedule_item=item, details='Main hall.')
+        days = self.client.get(url).json()['days']
+        self.assertEqual(days[-1]['day'], 'Closing: Sep 28, 2025')
+        self.assertEqual(days[-1]['items'][0]['details'], 'Main hall.')
+
+    def test_login_page(self):
+        self.assertWithinBudget(None, reverse('login'), 0)
+
+    def test_logout(self):
+        self.assertWithinBudget(self.member, reverse('logout'), 5, method='post')
+
+    # --- Participant ---
+    def test_team_list(self):
+        response = self.assertWithinBudget(self.loner, reverse('team_list'), 9)
+        self.assertContains(response, 'Members: 5 / 6')
+        self.assertContains(response, 'Next &rarr;')
+        self.assertWithinBudget(self.loner, reverse('team_list') + '?' + response.context['next_params'], 9)
+        self.assertWithinBudget(self.loner, reverse('team_list') + '?q=Team+1&open=1&problem=2', 9)
+
+    def test_profile(self):
+        self.assertWithinBudget(self.member, reverse('profile'), 7)
+
+    def test_participant_dashboard(self):
+        self.assertWithinBudget(self.member, reverse('participant_dashboard'), 8)
+
+    def test_team_dashboard_leader(self):
+        self.assertWithinBudget(self.leader, reverse('team_dashboard'), 10)
+
+    def test_team_dashboard_member(self):
+        self.assertWithinBudget(self.member, reverse('team_dashboard'), 9)
+
+    def test_team_dashboard_without_team(self):
+        self.assertWithinBudget(self.invited, reverse('team_dashboard'), 8)
+
+    def test_create_team(self):
+        self.assertWithinBudget(self.loner, reverse('create_team'), 10, method='post', data={'team_name': 'New Team'})
+
+    def test_invite_member(self):
+        self.assertWithinBudget(self.leader, reverse('invite_member'), 5, method='post', data={'email': 'new@example.com'})
+
+    def test_handle_invite(self):
+        invite = TeamInvite.objects.get(invited_email=self.invited.email)
+        self.assertWithinBudget(self.invited, reverse('handle_invite', args=[invite.id, 'accept']), 10)
+
+    def test_request_to_join_team(self):
+        self.assertWithinBudget(self.loner, reverse('request_to_join_team', args=[self.data['teams'][2].id]), 11)
+
+    def test_handle_join_request(self):
+        pending = TeamMember.objects.filter(team=self.data['teams'][0], status='pending').first()
+        self.assertWithinBudget(self.leader, reverse('handle_join_request', args=[pending.id, 'accept']), 12)
+
+    def test_select_problem(self):
+        leader = self.data['teams'][35].leader
+        self.assertWithinBudget(leader, reverse('select_problem', args=[self.data['problems'][14].id]), 9)
+
+    def test_submit_playground(self):
+        self.assertWithinBudget(self.member, reverse('submit_playground'), 10)
+
+    def test_feedback(self):
+        self.assertWithinBudget(self.member, reverse('feedback'), 6)
+
+    def test_notifications(self):
+        self.assertWithinBudget(self.member, reverse('notifications'), 16)
+
+    def test_certificate(self):
+        self.assertWithinBudget(self.member, reverse('view_certificate'), 8)
+
+    def test_certificate_image(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        # No template or font is checked in; draw on a blank page instead.
+        self.enterContext(mock.patch.object(
+            certificates, 'load_assets', return_value=(Image.new('RGB', (1200, 800), 'white'), ImageFont.load_default())
+        ))
+        self.enterContext(mock.patch.object(certificates, 'template_version', return_value='test'))
+        Certificate.objects.create(user=self.member, status='pending')
+        url = reverse('certificate_image', args=[certificates.certificate_key(certificates.certificate_name(self.member))])
+
+        response = self.assertWithinBudget(self.member, url, 4, status=(200,))
+        self.assertEqual(response['Content-Type'], 'image/png')
+        # Rendered once and recorded; later downloads only read the row.
+        self.assertWithinBudget(self.member, url, 3, status=(200,))
+        response = self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_exit_team(self):
+        self.assertWithinBudget(self.member, reverse('exit_team'), 6, method='post')
+
+    def test_delete_team(self):
+        leader = self.data['teams'][39].leader
+        self.assertWithinBudget(leader, reverse('delete_team'), 12, method='post')
+
+    # --- Judge ---
+    def test_judge_dashboard(self):
+        self.assertWithinBudget(self.judge, reverse('judge_dashboard'), 9)
+
+    def test_score_submission_form(self):
+        submission = self.data['submissions'][0]
+        self.assertWithinBudget(self.judge, reverse('score_submission', args=[submission.id]), 10)
+
+    def test_score_submission_save(self):
+        submission = self.data['submissions'][0]
+        self.assertWithinBudget(
+            self.judge, reverse('score_submission', args=[submission.id]), 8,
+            method='post', data={'score': '75', 'feedback': 'Nice.'},
+        )
+
+    # --- Organizer & staff ---
+    def test_organizer_dashboard(self):
+        self.assertWithinBudget(self.organizer, reverse('organizer_dashboard'), 9)
+
+    def test_view_team_by_organizer(self):
+        self.assertWithinBudget(self.organizer, reverse('view_team_by_organizer', args=[self.data['teams'][0].id]), 8)
+
+    def test_leaderboard(self):
+        self.assertWithinBudget(self.organizer, reverse('leaderboard'), 7)
+
+    def test_exports(self):
+        for dataset in ('teams', 'members', 'submissions', 'scores'):
+            self.assertWithinBudget(self.organizer, reverse('export_csv', args=[dataset]), 5)
+
+    def test_staff_dashboards(self):
+        self.assertWithinBudget(self.staff, reverse('judge_dashboard'), 9)
+        self.assertWithinBudget(self.staff, reverse('organizer_dashboard'), 9)
+
+    def test_perf_report(self):
+        self.assertWithinBudget(self.staff, reverse('perf_report'), 3)
+
+    # --- Access control still holds for every role ---
+    def test_role_restricted_pages(self):
+        for url in (reverse('judge_dashboard'), reverse('organizer_dashboard'), reverse('leaderboard')):
+            self.assertWithinBudget(self.member, url, 4, status=(403,))
+
+    # --- Conditional GET ---
+    def use_shared_cache(self):
+        # Data versions, and with them ETags, are only used with a cache every worker shares.
+        self.enterContext(mock.patch.object(caching, 'cache_is_shared', return_value=True))
+
+    def assertNotModifiedWhenUnchanged(self, user, url, max_queries):
+        self.client.force_login(user)
+        # The first response also sets the CSRF cookie, which the page depends on.
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304, url)
+        self.assertLessEqual(len(queries), max_queries, url)
+        return etag
+
+    def test_participant_cached_between_requests(self):
+        url = reverse('organizer_dashboard')
+        self.client.force_login(self.organizer)
+
+        def profile_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            return [query for query in queries.captured_queries if 'event_userprofile' in query['sql']]
+
+        # Only a cache every worker shares keeps the role between requests.
+        self.client.get(url)
+        self.assertTrue(profile_queries())
+        with mock.patch.object(caching, 'cache_is_shared', return_value=True):
+            self.client.get(url)
+            self.assertFalse(profile_queries())
+
+        self.client.force_login(self.loner)
+        self.assertFalse(self.client.get(reverse('team_list')).context['user_on_team'])
+        teams.add_member(self.data['teams'][39], self.loner)
+        self.assertTrue(self.client.get(reverse('team_list')).context['user_on_team'])
+
+    def test_no_etag_without_a_shared_cache(self):
+        self.client.force_login(self.member)
+        for url in (reverse('home'), reverse('team_list'), reverse('notifications')):
+            self.assertFalse(self.client.get(url).has_header('ETag'), url)
+
+    def test_conditional_get(self):
+        self.use_shared_cache()
+        # Only the session and user lookups remain; the view's own queries are skipped.
+        self.assertNotModifiedWhenUnchanged(self.member, reverse('home'), 3)
+        self.assertNotModifiedWhenUnchanged(self.loner, reverse('team_list'), 3)
+        self.assertNotModifiedWhenUnchanged(self.judge, reverse('judge_dashboard'), 3)
+        self.assertNotModifiedWhenUnchanged(self.member, reverse('view_certificate'), 3)
+        self.client.get(reverse('notifications'))
+        self.assertNotModifiedWhenUnchanged(self.member, reverse('notifications'), 3)
+
+    def test_conditional_get_sees_changes(self):
+        self.use_shared_cache()
+        url = reverse('judge_dashboard')
+        self.client.force_login(self.judge)
+        etag = self.client.get(url)['ETag']
+        JudgingScore.objects.filter(judge=self.judge).first().delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        url = reverse('notifications')
+        self.client.force_login(self.member)
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        Notification.objects.create(user=self.member, message='Something new')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_team_list_etag(self):
+        self.use_shared_cache()
+        url = reverse('team_list')
+        etag = self.assertNotModifiedWhenUnchanged(self.loner, url, 3)
+        # Someone else signing in saves their last_login, which no page shows.
+        Client().force_login(self.member)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        problem = ProblemStatement.objects.first()
+        problem.title = 'Renamed'
+        problem.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_async_views_match_sync_views(self):
+        self.use_shared_cache()
+        use_async_views(True)
+        self.addCleanup(use_async_views, False)
+        get = async_to_sync(self.async_client.get)
+        self.async_client.force_login(self.member)
+        for name in ('home', 'team_list', 'participant_dashboard', 'notifications'):
+            url = reverse(name)
+            get(url)
+            response = get(url)
+            self.assertEqual(response.status_code, 200)
+            # A matching ETag is answered from the cache, without touching the view.
+            with self.assertNumQueries(2):
+                self.assertEqual(get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+        self.async_client.logout()
+        get(reverse('home'))
+        with self.assertNumQueries(0):
+            self.assertContains(get(reverse('home')), 'NextGen')
+            self.assertEqual(get(reverse('schedule_json')).status_code, 200)
+
+
+class PerfMonitorTests(TestCase):
+    """
+    With PERF_MONITOR on, every request is sampled per view, and perf_report
+    summarises the samples from the staff endpoint or a log file.
+    """
+    def setUp(self):
+        cache.clear()
+        perf.stats.reset()
+        self.addCleanup(perf.stats.reset)
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        self.log = os.path.join(log_dir, 'perf.jsonl')
+        self.enterContext(override_settings(PERF_MONITOR=True, PERF_MONITOR_LOG=self.log))
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_recorder_counts_repeated_queries(self):
+        recorder = perf.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for pk in (1, 2, 3):
+                User.objects.filter(pk=pk).exists()
+            User.objects.count()
+        self.assertEqual((recorder.count, recorder.duplicates), (4, 2))
+        self.assertEqual(recorder.most_repeated()[1], 3)
+
+    def test_requests_are_sampled_per_view(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+        self.client.get(reverse('schedule_json'))
+        views = {row['view']: row for row in self.client.get(reverse('perf_report')).json()['views']}
+        self.assertEqual({name: row['requests'] for name, row in views.items()}, {'home': 2, 'schedule_json': 1})
+        self.assertGreater(views['home']['max_queries'], 0)
+        self.assertGreater(views['home']['avg_template_ms'], 0)
+
+        # Only the resetting request itself is left.
+        self.client.post(reverse('perf_report'), {'reset': '1'})
+        views = self.client.get(reverse('perf_report')).json()['views']
+        self.assertEqual([row['view'] for row in views], ['perf_report'])
+
+    def test_report_command_reads_the_log(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('schedule_json'))
+        out = io.StringIO()
+        call_command('perf_report', '--log', self.log, '--json', stdout=out)
+        self.assertEqual(sorted(row['view'] for row in json.loads(out.getvalue())), ['home', 'schedule_json'])
+
+        out = io.StringIO()
+        call_command('perf_report', '--log', self.log, '--limit', '1', stdout=out)
+        self.assertIn('avg q', out.getvalue())
+        self.assertEqual(sum(name in out.getvalue() for name in ('home', 'schedule_json')), 1)
+        with self.assertRaises(CommandError):
+            call_command('perf_report', '--log', self.log + '.missing')
+
+
+class TeamMemberCountTests(TestCase):
+    """
+    Team.accepted_member_count follows TeamMember changes, and browsing pages
+    through every team exactly once.
+    """
+    def setUp(self):
+        self.users = User.objects.bulk_create([User(username=f'user{i}') for i in range(8)])
+        self.team = Team.objects.create(team_name='Alpha', team_code='ALPHA', leader=self.users[0], max_size=3)
+        self.other = Team.objects.create(team_name='Beta', team_code='BETA', leader=self.users[1])
+        TeamMember.objects.create(team=self.team, participant=self.users[0], role='leader')
+        TeamMember.objects.create(team=self.other, participant=self.users[1], role='leader')
+
+    def count(self, team):
+        team.refresh_from_db()
+        return team.accepted_member_count
+
+    def test_count_follows_membership_changes(self):
+        self.assertEqual(self.count(self.team), 1)
+        request = TeamMember.objects.create(team=self.team, participant=self.users[2], role='member', status='pending')
+        self.assertEqual(self.count(self.team), 1)
+
+        request = TeamMember.objects.get(pk=request.pk)
+        request.status = 'accepted'
+        request.save(update_fields=['status'])
+        request.save()
+        self.assertEqual(self.count(self.team), 2)
+
+        request.team = self.other
+        request.save()
+        self.assertEqual((self.count(self.team), self.count(self.other)), (1, 2))
+
+        TeamMember.objects.filter(pk=request.pk).defer('status').get().delete()
+        self.assertEqual(self.count(self.other), 1)
+
+        request = TeamMember.objects.create(team=self.team, participant=self.users[3], role='member')
+        request.status = 'removed'
+        request.save()
+        self.assertEqual(self.count(self.team), 1)
+
+        TeamMember.objects.filter(team=self.team).update(status='removed')
+        recount_members()
+        self.assertEqual(self.count(self.team), 0)
+
+    def test_full_team_is_refused_before_saving(self):
+        for user in self.users[2:4]:
+            teams.add_member(self.team, user)
+        extra = TeamMember(team=self.team, participant=self.users[4], role='member', status='accepted')
+        with self.assertRaises(ValidationError):
+            extra.full_clean()
+        with self.assertRaises(teams.TeamFull):
+            extra.save()
+        self.assertFalse(TeamMember.objects.filter(participant=self.users[4]).exists())
+        self.assertEqual(self.count(self.team), 3)
+
+        pending = TeamMember.objects.create(team=self.team, participant=self.users[4], role='member', status='pending')
+        pending.full_clean()
+        with self.assertRaises(teams.TeamFull):
+            teams.accept_member(pending)
+        self.assertEqual(TeamMember.objects.get(pk=pending.pk).status, 'pending')
+
+    def test_rejoin_after_leaving(self):
+        member = teams.add_member(self.team, self.users[2])
+        member.status = 'removed'
+        member.save()
+        self.assertEqual(teams.add_member(self.team, self.users[2]).pk, member.pk)
+        self.assertEqual(self.count(self.team), 2)
+
+        TeamMember.objects.filter(pk=member.pk).update(status='rejected')
+        recount_members()
+        self.assertEqual(teams.request_to_join(self.team, self.users[2]).status, 'pending')
+        with self.assertRaises(teams.AlreadyOnTeam):
+            teams.add_member(self.team, self.users[0])
+
+    def test_browse(self):
+        for i, user in enumerate(self.users[2:]):
+            team = Team.objects.create(team_name=f'Team {i % 3}', team_code=f'T{i}', leader=user, max_size=1 + i % 2)
+            TeamMember.objects.create(team=team, participant=user, role='leader')
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = browse(cursor=cursor, limit=3)
+            seen += page
+            if cursor is None:
+                break
+        self.assertEqual([team.pk for team in seen], list(Team.objects.order_by('team_name', 'id').values_list('pk', flat=True)))
+
+        self.assertEqual([team.team_name for team in browse(query='alp')[0]], ['Alpha'])
+        self.assertEqual([team.team_name for team in browse(query='beta')[0]], ['Beta'])
+        # Prefix search, so the index on search_name can serve it.
+        self.assertEqual(browse(query='lph')[0], [])
+        self.assertEqual(len(browse(query='team ')[0]), 6)
+        self.assertTrue(all(team.open_slots for team in browse(open_only=True)[0]))
+        self.assertEqual(len(browse(open_only=True)[0]), 5)
+        self.assertEqual(browse(cursor='not-a-cursor')[0], browse()[0])
+
+
+class JudgingTests(TestCase):
+    """
+    The judge dashboard's progress counts, and the leaderboard built from
+    several judges' scores.
+    """
+    def setUp(self):
+        cache.clear()
+        self.judges = User.objects.bulk_create([User(username=f'judge{i}') for i in range(3)])
+        UserProfile.objects.bulk_create([UserProfile(user=judge, user_role='judge') for judge in self.judges])
+        leaders = User.objects.bulk_create([User(username=f'leader{i}') for i in range(3)])
+        self.submissions = [
+            Submission.objects.create(team=Team.objects.create(team_name=f'Team {i}', team_code=f'T{i}', leader=leader))
+            for i, leader in enumerate(leaders)
+        ]
+
+    def score(self, judge, submission, score):
+        JudgingScore.objects.create(judge=judge, submission=submission, score=score)
+
+    def test_dashboard_progress(self):
+        for judge in self.judges:
+            self.score(judge, self.submissions[0], 7)
+        self.score(self.judges[1], self.submissions[1], 5)
+
+        self.client.force_login(self.judges[0])
+        response = self.client.get(reverse('judge_dashboard'))
+        self.assertEqual((response.context['scored_count'], response.context['total_count']), (1, 3))
+        self.client.force_login(self.judges[1])
+        response = self.client.get(reverse('judge_dashboard'))
+        self.assertEqual((response.context['scored_count'], response.context['total_count']), (2, 3))
+
+    def ranked(self):
+        return [entry.submission for entry in leaderboard.ranking()]
+
+    def test_normalisation_corrects_harsh_and_lenient_judges(self):
+        harsh, lenient, _ = self.judges
+        best, worst, shared = self.submissions
+        with self.captureOnCommitCallbacks(execute=True):
+            # The harsh judge's favourite still scores lower than the lenient judge's least favourite.
+            self.score(harsh, best, 5)
+            self.score(harsh, shared, 1)
+            self.score(lenient, worst, 8)
+            self.score(lenient, shared, 10)
+        entries = {entry.submission: entry for entry in leaderboard.ranking()}
+        self.assertEqual(entries[worst].mean_score, 8)
+        self.assertEqual(entries[best].mean_score, 5)
+        self.assertEqual(self.ranked(), [best, shared, worst])
+        self.assertAlmostEqual(entries[best].normalized_score, 1)
+        self.assertAlmostEqual(entries[shared].normalized_score, 0)
+        self.assertAlmostEqual(entries[worst].normalized_score, -1)
+
+    def test_judge_without_spread_scores_zero(self):
+        single, constant, _ = self.judges
+        with self.captureOnCommitCallbacks(execute=True):
+            self.score(single, self.submissions[0], 9)
+            self.score(constant, self.submissions[1], 6)
+            self.score(constant, self.submissions[2], 6)
+        entries = list(leaderboard.ranking())
+        self.assertEqual([entry.normalized_score for entry in entries], [0, 0, 0])
+        # Ties fall back to the raw mean.
+        self.assertEqual(self.ranked(), self.submissions)
+
+    def test_refresh_without_upsert_support(self):
+        judge = self.judges[0]
+        for submission, value in zip(self.submissions[:2], (3, 5)):
+            self.score(judge, submission, value)
+        leaderboard.refresh()
+        self.score(judge, self.submissions[2], 7)
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            self.assertEqual(leaderboard.refresh(), 3)
+        self.assertEqual(self.ranked(), self.submissions[::-1])
+        self.assertEqual([entry.mean_score for entry in leaderboard.ranking()], [7, 5, 3])
+        # The existing rows were updated: the new score moved the judge's mean to 5.
+        self.assertAlmostEqual(LeaderboardEntry.objects.get(submission=self.submissions[1]).normalized_score, 0)
+
+    def test_refresh_for_judge_recomputes_all_their_submissions(self):
+        judge = self.judges[0]
+        for submission, value in zip(self.submissions, (3, 5, 7)):
+            self.score(judge, submission, value)
+        leaderboard.refresh()
+        self.assertEqual(self.ranked(), self.submissions[::-1])
+
+        # Lowering one score shifts the judge's mean, moving the other two submissions as well.
+        JudgingScore.objects.filter(judge=judge, submission=self.submissions[2]).update(score=1)
+        leaderboard.refresh_for_judge(judge.pk, self.submissions[2].pk)
+        entries = {entry.submission: entry for entry in leaderboard.ranking()}
+        self.assertEqual(self.ranked(), [self.submissions[1], self.submissions[0], self.submissions[2]])
+        self.assertAlmostEqual(entries[self.submissions[0]].normalized_score, 0)
+
+
+class ExportTests(TestCase):
+    """
+    CSV exports stream the same rows under WSGI, ASGI and the management command,
+    with formula-like text defused.
+    """
+    def setUp(self):
+        organizer, leader = User.objects.bulk_create([User(username='organizer'), User(username='leader')])
+        UserProfile.objects.create(user=organizer, user_role='organizer')
+        Team.objects.create(team_name='=HYPERLINK("http://x")', team_code='EVIL', leader=leader)
+        Team.objects.create(team_name='Alpha', team_code='-ALPHA', leader=leader)
+        self.organizer = organizer
+        self.url = reverse('export_csv', args=['teams'])
+
+    def test_formulas_are_quoted(self):
+        self.client.force_login(self.organizer)
+        rows = list(csv.reader(io.StringIO(b''.join(self.client.get(self.url).streaming_content).decode())))
+        self.assertEqual([row[1:3] for row in rows[1:]], [["'=HYPERLINK(\"http://x\")", 'EVIL'], ['Alpha', "'-ALPHA"]])
+
+    def test_asgi_and_command_match(self):
+        self.client.force_login(self.organizer)
+        expected = b''.join(self.client.get(self.url).streaming_content).decode()
+
+        async def fetch():
+            response = await self.async_client.get(self.url)
+            return response, [chunk async for chunk in response.streaming_content]
+
+        self.async_client.force_login(self.organizer)
+        with mock.patch.object(exports, 'CHUNK_SIZE', 1):
+            response, chunks = async_to_sync(fetch)()
+        self.assertTrue(response.is_async)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b''.join(chunks).decode(), expected)
+
+        out = io.StringIO()
+        call_command('export_event', dataset=['teams'], stdout=out)
+        self.assertEqual(out.getvalue(), expected)
+
+
+class BulkImportTests(TestCase):
+    """
+    create_bulk_users validates the whole file first, skips what it can't or
+    needn't create, and inserts the rest in chunks.
+    """
+    ROWS = [
+        ('ada', 'ada@example.com', 'secret-1', 'participant'),
+        ('alan', 'alan@example.com', 'secret-1', 'judge'),
+        ('grace', 'grace@example.com', 'secret-2', 'participant'),
+        ('ada', 'ada@elsewhere.com', 'other', 'judge'),
+        ('taken', 'taken@example.com', 'secret-3', 'participant'),
+        ('nobody', '', 'secret-4', 'participant'),
+    ]
+
+    def setUp(self):
+        User.objects.create_user(username='taken')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['username', 'email', 'password', 'role'])
+            writer.writerows(self.ROWS)
+        self.addCleanup(os.remove, file.name)
+        self.path = file.name
+
+    def test_import(self):
+        out = io.StringIO()
+        call_command('create_bulk_users', self.path, '--workers', '1', '--chunk-size', '2', stdout=out)
+        output = out.getvalue()
+        self.assertIn("User 'ada' appears more than once", output)
+        self.assertIn("User 'taken' already exists", output)
+        self.assertIn('Skipping row due to missing data', output)
+        self.assertIn('Successfully created 3 user(s)', output)
+
+        users = {user.username: user for user in User.objects.select_related('userprofile').exclude(username='taken')}
+        self.assertEqual(
+            {username: (user.email, user.userprofile.user_role) for username, user in users.items()},
+            {'ada': ('ada@example.com', 'participant'), 'alan': ('alan@example.com', 'judge'),
+             'grace': ('grace@example.com', 'participant')},
+        )
+        self.assertTrue(users['ada'].check_password('secret-1'))
+        self.assertTrue(users['grace'].check_password('secret-2'))
+        # Each distinct password is hashed once.
+        self.assertEqual(users['ada'].password, users['alan'].password)
+
+    def test_dry_run_writes_nothing(self):
+        out = io.StringIO()
+        call_command('create_bulk_users', self.path, '--dry-run', stdout=out)
+        self.assertIn('Dry run: 3 user(s) would be created, 1 already exist.', out.getvalue())
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['taken'])
+        self.assertFalse(UserProfile.objects.exists())
+
+
+class CertificateTests(TestCase):
+    """
+    Certificates are addressed by their content, so only missing or stale ones are rendered.
+    """
+    def setUp(self):
+        self.enterContext(mock.patch.object(
+            certificates, 'load_assets', return_value=(Image.new('RGB', (1200, 800), 'white'), ImageFont.load_default())
+        ))
+        self.version = self.enterContext(mock.patch.object(certificates, 'template_version', return_value='v1'))
+        self.users = User.objects.bulk_create([
+            User(username='ada', first_name='Ada', last_name='Lovelace'), User(username='alan'),
+        ])
+        UserProfile.objects.bulk_create([UserProfile(user=user, user_role='participant') for user in self.users])
+        team = teams.create_team(Team(team_name='Alpha', team_code='ALPHA'), self.users[0])
+        teams.add_member(team, self.users[1])
+        Submission.objects.create(team=team)
+
+    def test_key_is_content_addressed(self):
+        key = certificates.certificate_key('Ada Lovelace')
+        self.assertEqual(certificates.certificate_key('Ada Lovelace'), key)
+        self.assertNotEqual(certificates.certificate_key('Ada King'), key)
+        self.version.return_value = 'v2'
+        self.assertNotEqual(certificates.certificate_key('Ada Lovelace'), key)
+        self.assertEqual(certificates.certificate_path('Ada Lovelace'), f"certificates/{certificates.certificate_key('Ada Lovelace')}.png")
+
+    def test_up_to_date_certificates_are_skipped(self):
+        Certificate.objects.bulk_create([
+            Certificate(user=user, status='ready', certificate_file=certificates.certificate_path(certificates.certificate_name(user)))
+            for user in self.users
+        ])
+        out = io.StringIO()
+        # The command imported these by name.
+        self.enterContext(mock.patch.object(generate_certificates, 'load_assets', certificates.load_assets))
+        self.enterContext(mock.patch.object(generate_certificates, 'template_version', certificates.template_version))
+        with mock.patch.object(generate_certificates, 'ProcessPoolExecutor') as pool:
+            call_command('generate_certificates', stdout=out)
+        pool.assert_not_called()
+        self.assertIn('2 eligible participant(s): 0 to render, 2 already up to date.', out.getvalue())
+
+    def test_record_without_upsert_support(self):
+        Certificate.objects.create(user=self.users[0], status='pending')
+        rendered = [(user.pk, user.username, f'certificates/{user.username}.png') for user in self.users]
+        for supported in (True, False):
+            Certificate.objects.filter(user=self.users[1]).delete()
+            with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', supported):
+                generate_certificates._record(rendered, batch_size=1)
+            self.assertEqual(
+                sorted(Certificate.objects.values_list('user__username', 'status', 'certificate_file')),
+                [('ada', 'ready', 'certificates/ada.png'), ('alan', 'ready', 'certificates/alan.png')],
+            )
+
+
+class CertificateRenderTests(TransactionTestCase):
+    """
+    generate_certificates renders in worker processes and records the results in bulk.
+    """
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        template = (Image.new('RGB', (1200, 800), 'white'), ImageFont.load_default())
+        # Forked workers inherit these patches.
+        for module in (certificates, generate_certificates):
+            self.enterContext(mock.patch.object(module, 'load_assets', return_value=template))
+            self.enterContext(mock.patch.object(module, 'template_version', return_value='v1'))
+        self.users = User.objects.bulk_create([User(username='ada', first_name='Ada'), User(username='alan')])
+        UserProfile.objects.bulk_create([UserProfile(user=user, user_role='participant') for user in self.users])
+        team = teams.create_team(Team(team_name='Alpha', team_code='ALPHA'), self.users[0])
+        teams.add_member(team, self.users[1])
+        Submission.objects.create(team=team)
+
+    def test_render_then_only_stale(self):
+        out = io.StringIO()
+        call_command('generate_certificates', '--workers', '2', stdout=out)
+        self.assertIn('Rendered 2 certificate(s)', out.getvalue())
+        for certificate in Certificate.objects.select_related('user'):
+            self.assertEqual(certificate.status, 'ready')
+            self.assertEqual(certificate.certificate_file.name, certificates.certificate_path(certificates.certificate_name(certificate.user)))
+            self.assertTrue(os.path.exists(certificate.certificate_file.path))
+
+        User.objects.filter(username='alan').update(first_name='Alan', last_name='Turing')
+        out = io.StringIO()
+        call_command('generate_certificates', '--workers', '2', stdout=out)
+        self.assertIn('2 eligible participant(s): 1 to render, 1 already up to date.', out.getvalue())
+        self.assertEqual(Certificate.objects.get(user__username='alan').rendered_name, 'Alan Turing')
+
+
+class JobQueueTests(TestCase):
+    """
+    Claiming, retries with backoff, final failure and reclaiming jobs whose worker died.
+    """
+    def setUp(self):
+        self.calls = []
+        self.enterContext(mock.patch.dict(jobs._handlers, {'flaky': self.flaky}))
+        self.enterContext(mock.patch.dict(jobs._failure_handlers, {'flaky': self.gave_up}))
+
+    def flaky(self, **payload):
+        self.calls.append(payload)
+        raise RuntimeError('boom')
+
+    def gave_up(self, **payload):
+        self.calls.append('gave up')
+        raise RuntimeError('the failure handler failed too')
+
+    def test_job_is_claimed_once(self):
+        job = jobs.enqueue('flaky', n=1)
+        claimed = jobs.claim_next()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, 'running', 1))
+        self.assertIsNone(jobs.claim_next())
+
+    def test_retry_backoff_then_failure(self):
+        job = jobs.enqueue('flaky', max_attempts=3, n=1)
+        for attempt, delay in enumerate(jobs.RETRY_DELAYS[:2], start=1):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            before = timezone.now()
+            with self.assertLogs('event.jobs', 'WARNING'):
+                job = jobs.run_job(jobs.claim_next())
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('queued', attempt))
+            self.assertIn('boom', job.last_error)
+            self.assertAlmostEqual((job.run_at - before).total_seconds(), delay, delta=5)
+            self.assertIsNone(jobs.claim_next())
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('event.jobs', 'ERROR') as logs:
+            jobs.run_job(jobs.claim_next())
+        self.assertIn('Failure handler', logs.output[-1])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertEqual(self.calls, [{'n': 1}] * 3 + ['gave up'])
+
+    def test_stale_running_jobs_are_reclaimed(self):
+        retried = jobs.enqueue('flaky', max_attempts=2, n=1)
+        last_try = jobs.enqueue('flaky', max_attempts=1, n=2)
+        fresh = jobs.enqueue('flaky', n=3)
+        for _ in range(3):
+            jobs.claim_next()
+        long_ago = timezone.now() - timedelta(seconds=jobs.LEASE_SECONDS + 1)
+        Job.objects.exclude(pk=fresh.pk).update(updated_at=long_ago)
+
+        with self.assertLogs('event.jobs', 'WARNING'):
+            self.assertEqual(jobs.reclaim_stale(), 2)
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[job.pk] for job in (retried, last_try, fresh)], ['queued', 'failed', 'running']
+        )
+        self.assertEqual(self.calls, ['gave up'])
+        self.assertEqual(jobs.claim_next().pk, retried.pk)
+
+    def test_certificate_fails_when_its_worker_died_on_the_last_attempt(self):
+        user = User.objects.create_user(username='ada')
+        Certificate.objects.create(user=user, status='pending')
+        jobs.enqueue(certificates.RENDER_JOB, max_attempts=1, user_id=user.pk)
+        jobs.claim_next()
+        Job.objects.update(updated_at=timezone.now() - timedelta(seconds=jobs.LEASE_SECONDS + 1))
+
+        with self.assertLogs('event.jobs', 'WARNING'):
+            self.assertEqual(jobs.reclaim_stale(), 1)
+        self.assertEqual(Certificate.objects.get(user=user).status, 'failed')
+        # Already failed: reclaiming again finds nothing and calls nothing.
+        self.assertEqual(jobs.reclaim_stale(), 0)
+
+
+class CapacityConcurrencyTests(TransactionTestCase):
+    """
+    Fire many accepts and problem selections at once, each on its own
+    connection, and check no team or problem ends up over its limit.
+    """
+    WORKERS = 12
+
+    def run_concurrently(self, calls):
+        barrier = threading.Barrier(len(calls))
+        outcomes = []
+
+        def worker(call):
+            try:
+                barrier.wait()
+                for attempt in range(20):
+                    try:
+                        call()
+                        outcomes.append('ok')
+                        return
+                    except (teams.TeamFull, teams.ProblemFull):
+                        outcomes.append('full')
+                        return
+                    except teams.AlreadyOnTeam:
+                        outcomes.append('on a team')
+                        return
+                    except OperationalError:
+                        # SQLite reports a busy database instead of waiting on a row lock.
+                        time.sleep(0.01 * (attempt + 1))
+                outcomes.append('gave up')
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(call,)) for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_team_never_exceeds_max_size(self):
+        users = User.objects.bulk_create([User(username=f'user{i}') for i in range(self.WORKERS + 1)])
+        team = Team.objects.create(team_name='Alpha', team_code='ALPHA', leader=users[0], max_size=4)
+        teams.add_member(team, users[0], role='leader')
+        requests = TeamMember.objects.bulk_create([
+            TeamMember(team=team, participant=user, role='member', status='pending') for user in users[1:6]
+        ])
+
+        calls = [lambda member=member: teams.accept_member(TeamMember.objects.get(pk=member.pk)) for member in requests]
+        calls += [lambda user=user: teams.add_member(team, user) for user in users[6:]]
+        outcomes = self.run_concurrently(calls)
+
+        self.assertEqual(outcomes.count('ok'), 3)
+        self.assertEqual(outcomes.count('full'), len(calls) - 3)
+        team.refresh_from_db()
+        self.assertEqual(team.accepted_member_count, 4)
+        self.assertEqual(TeamMember.objects.filter(team=team, status='accepted').count(), 4)
+
+    def test_participant_joins_at_most_one_team(self):
+        users = User.objects.bulk_create([User(username=f'user{i}') for i in range(self.WORKERS + 1)])
+        joiner, leaders = users[0], users[1:]
+        team_list = Team.objects.bulk_create([
+            Team(team_name=f'Team {i}', team_code=f'T{i}', leader=leader) for i, leader in enumerate(leaders)
+        ])
+        requests = TeamMember.objects.bulk_create([
+            TeamMember(team=team, participant=joiner, role='member', status='pending') for team in team_list
+        ])
+
+        calls = [lambda member=member: teams.accept_member(TeamMember.objects.get(pk=member.pk)) for member in requests]
+        outcomes = self.run_concurrently(calls)
+
+        self.assertEqual(outcomes.count('ok'), 1)
+        self.assertEqual(outcomes.count('on a team'), len(calls) - 1)
+        self.assertEqual(TeamMember.objects.filter(participant=joiner, status='accepted').count(), 1)
+        self.assertEqual(sum(Team.objects.values_list('accepted_member_count', flat=True)), 1)
+
+    def test_problem_never_exceeds_team_limit(self):
+        users = User.objects.bulk_create([User(username=f'user{i}') for i in range(self.WORKERS)])
+        problem = ProblemStatement.objects.create(title='Popular', description='Everyone wants this.')
+        team_list = Team.objects.bulk_create([
+            Team(team_name=f'Team {i}', team_code=f'T{i}', leader=user) for i, user in enumerate(users)
+        ])
+
+        outcomes = self.run_concurrently([lambda team=team: teams.select_problem(team, problem) for team in team_list])
+
+        self.assertEqual(outcomes.count('ok'), teams.MAX_TEAMS_PER_PROBLEM)
+        self.assertEqual(problem.teams_working_on.count(), teams.MAX_TEAMS_PER_PROBLEM)
+
+
+class NotificationStreamTests(TestCase):
+    """
+    New notifications and announcements reach open streams once committed.
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_stream_pushes_new_notifications(self):
+        user = User.objects.create_user(username='streamer', password='password')
+        self.async_client.force_login(user)
+
+        def notify():
+            with self.captureOnCommitCallbacks(execute=True):
+                Notification.objects.create(user=user, message='Your team was accepted')
+            with self.captureOnCommitCallbacks(execute=True):
+                Announcement.objects.create(title='Lunch is served', message='Come to the hall.')
+
+        async def read_stream():
+            response = await self.async_client.get(reverse('notification_stream'))
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            events = aiter(response.streaming_content)
+            received = [await anext(events)]
+            await sync_to_async(notify)()
+            for _ in range(2):
+                received.append(await asyncio.wait_for(anext(events), 5))
+            await events.aclose()
+            return [chunk.decode() for chunk in received]
+
+        hello, notification, announcement = async_to_sync(read_stream)()
+        self.assertIn('event: unread\ndata: {"count": 0}', hello)
+        self.assertIn('Your team was accepted', notification)
+        self.assertIn('event: announcement', announcement)
+        self.assertEqual(live.broker().subscriber_count(), 0)
+
+    def test_stream_closes_its_connection_before_waiting(self):
+        user = User.objects.create_user(username='idler', password='password')
+        self.async_client.force_login(user)
+
+        async def read_hello():
+            response = await self.async_client.get(reverse('notification_stream'))
+            events = aiter(response.streaming_content)
+            hello = await anext(events)
+            closed = db.close.call_count
+            await events.aclose()
+            return hello.decode(), closed
+
+        with mock.patch.object(views, 'connection', in_atomic_block=False) as db:
+            hello, closed = async_to_sync(read_hello)()
+        self.assertIn('event: unread', hello)
+        self.assertEqual(closed, 1)
+
+    @override_settings(WEB_CONCURRENCY=4, LIVE_EVENTS_BACKEND='local')
+    def test_stream_polls_when_events_miss_other_workers(self):
+        user = User.objects.create_user(username='elsewhere', password='password')
+        self.async_client.force_login(user)
+
+        async def read_all():
+            return (await self.async_client.get(reverse('notification_stream'))).content.decode()
+
+        self.assertEqual(async_to_sync(read_all)(), 'retry: 30000\nevent: unread\ndata: {"count": 0}\n\n')
+        self.assertEqual(live.broker().subscriber_count(), 0)
+
+    def test_pages_open_the_stream_only_when_enabled(self):
+        self.client.force_login(User.objects.create_user(username='reader', password='password'))
+        self.assertNotContains(self.client.get(reverse('notifications')), 'EventSource')
+        with override_settings(LIVE_NOTIFICATIONS=True):
+            self.assertContains(self.client.get(reverse('notifications')), 'new EventSource')
+
+    def test_stream_under_wsgi_ends_after_the_count(self):
+        user = User.objects.create_user(username='poller', password='password')
+        Notification.objects.create(user=user, message='Welcome')
+        self.client.force_login(user)
+        body = self.client.get(reverse('notification_stream')).content.decode()
+        self.assertEqual(body, 'retry: 30000\nevent: unread\ndata: {"count": 1}\n\n')
+
+
+class NotificationInboxTests(TestCase):
+    """
+    The inbox pages through notifications and announcements by keyset, marks
+    only what was shown as read, and old read notifications can be pruned.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='password')
+        self.user.date_joined = timezone.now() - timedelta(days=30)
+        self.user.save()
+
+    def test_pages_cover_inbox_once_and_mark_only_shown_items(self):
+        now = timezone.now()
+        notifications = Notification.objects.bulk_create([
+            Notification(user=self.user, message=f'Note {i}') for i in range(25)
+        ])
+        announcements = Announcement.objects.bulk_create([
+            Announcement(title=f'News {i}', message='...') for i in range(5)
+        ])
+        # Identical timestamps across both sources exercise the tie-breaking.
+        Notification.objects.update(created_at=now)
+        Announcement.objects.update(created_at=now)
+
+        first_page, cursor = inbox.inbox_page(self.user, limit=12)
+        inbox.mark_read(self.user, first_page)
+        self.assertEqual(Notification.objects.filter(is_read=True).count(), 7)
+        self.assertEqual(inbox.unread_count(self.user), 18)
+
+        seen = first_page
+        while cursor:
+            page, cursor = inbox.inbox_page(self.user, cursor, limit=12)
+            seen += page
+        keys = [(type(item).__name__, item['id'] if isinstance(item, dict) else item.pk) for item in seen]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(len(keys), len(notifications) + len(announcements))
+
+    def test_prune_deletes_old_read_notifications_in_batches(self):
+        old = timezone.now() - timedelta(days=100)
+        Notification.objects.bulk_create(
+            [Notification(user=self.user, message=f'Old {i}', is_read=True) for i in range(5)]
+            + [Notification(user=self.user, message='Old unread')]
+            + [Notification(user=self.user, message='Recent', is_read=True)]
+        )
+        Notification.objects.exclude(message='Recent').update(created_at=old)
+
+        archive = io.StringIO()
+        deleted = inbox.prune_read(timezone.now() - timedelta(days=90), batch_size=2, archive=archive)
+        self.assertEqual(deleted, 5)
+        self.assertEqual(len(archive.getvalue().splitlines()), 5)
+        self.assertEqual(
+            sorted(Notification.objects.values_list('message', flat=True)), ['Old unread', 'Recent']
+        )
+
+
+class UnreadCounterTests(TestCase):
+    """
+    With a shared cache the unread count is counted once, then kept there as
+    notifications change; with a per-process one it is counted every time.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        Notification.objects.create(user=self.user, message='Welcome')
+
+    def test_counter_follows_notifications(self):
+        self.enterContext(mock.patch.object(caching, 'cache_is_shared', return_value=True))
+        self.assertIsNone(inbox.cached_unread_count(self.user))
+        self.assertEqual(inbox.unread_count(self.user), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(inbox.unread_count(self.user), 1)
+            self.assertEqual(inbox.cached_unread_count(self.user), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notify(self.user.pk, 'Invited')
+        # Incremented in place, not recounted.
+        with self.assertNumQueries(0):
+            self.assertEqual(inbox.unread_count(self.user), 2)
+
+        notification = Notification.objects.get(message='Welcome')
+        notification.is_read = True
+        notification.save()
+        self.assertIsNone(inbox.cached_unread_count(self.user))
+        self.assertEqual(inbox.unread_count(self.user), 1)
+        Notification.objects.filter(message='Invited').get().delete()
+        self.assertEqual(inbox.unread_count(self.user), 0)
+
+    def test_per_process_cache_is_not_used(self):
+        inbox.unread_count(self.user)
+        self.assertIsNone(inbox.cached_unread_count(self.user))
+        # As if another worker had saved a notification: nothing here was told.
+        Notification.objects.bulk_create([Notification(user=self.user, message='Elsewhere')])
+        with self.assertNumQueries(3):
+            self.assertEqual(inbox.unread_count(self.user), 2)
+
+    def test_context_processor_counts_only_when_shown(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(0):
+            context = unread_notifications_count(request)
+        # Cold: the watermark, the announcement index and the personal count.
+        with self.assertNumQueries(3):
+            self.assertEqual(context['unread_count'], 1)
+
+
+class AnnouncementTests(TestCase):
+    """
+    Announcements are stored once and read through each user's watermark.
+    """
+    def setUp(self):
+        cache.clear()
+        # Also covers the cached watermark.
+        self.enterContext(mock.patch.object(caching, 'cache_is_shared', return_value=True))
+        self.users = [User.objects.create_user(username=f'reader{i}') for i in range(2)]
+        User.objects.update(date_joined=timezone.now() - timedelta(days=30))
+        for user in self.users:
+            user.refresh_from_db()
+
+    def test_broadcast_and_watermark(self):
+        first = Announcement.objects.create(title='Doors open', message='...')
+        late = User.objects.create_user(username='late', date_joined=timezone.now() + timedelta(seconds=1))
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual([inbox.unread_count(user) for user in (*self.users, late)], [1, 1, 0])
+
+        reader, other = self.users
+        page, _ = inbox.inbox_page(reader)
+        self.assertEqual([item['message'] for item in page], ['New Announcement: Doors open'])
+        inbox.mark_read(reader, page)
+        self.assertEqual(AnnouncementWatermark.objects.get(user=reader).last_seen_announcement_id, first.pk)
+        self.assertEqual((inbox.unread_count(reader), inbox.unread_count(other)), (0, 1))
+
+        second = Announcement.objects.create(title='Lunch', message='...')
+        self.assertEqual(inbox.unread_count(reader), 1)
+        page, _ = inbox.inbox_page(reader)
+        self.assertEqual([item['is_read'] for item in page], [False, True])
+        inbox.mark_read(reader, page)
+        # An older announcement shown again never moves the watermark back.
+        inbox.mark_read(reader, [{'id': first.pk, 'is_read': False}])
+        self.assertEqual(AnnouncementWatermark.objects.get(user=reader).last_seen_announcement_id, second.pk)
+        self.assertEqual(inbox.unread_count(reader), 0)
+
+
+class SignalBatchingTests(TestCase):
+    """
+    Signal handlers coalesce their writes into one statement per transaction.
+    """
+    def setUp(self):
+        self.leader, *self.users = User.objects.bulk_create([User(username=f'user{i}') for i in range(6)])
+        self.team = Team.objects.create(team_name='Alpha', team_code='ALPHA', leader=self.leader, max_size=10)
+
+    def test_join_requests_are_notified_with_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                for user in self.users:
+                    TeamMember.objects.create(team=self.team, participant=user, role='member', status='pending')
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "event_notification"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Notification.objects.filter(user=self.leader).count(), len(self.users))
+
+    def test_rolled_back_notifications_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    notify(self.leader.pk, 'Rolled back')
+                    raise OperationalError
+            except OperationalError:
+                pass
+            notify(self.leader.pk, 'Kept')
+        self.assertEqual(list(Notification.objects.values_list('message', flat=True)), ['Kept'])
+
+    def test_savepoint_rollback_drops_only_its_notifications(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                notify(self.leader.pk, 'Before')
+                try:
+                    with transaction.atomic():
+                        notify(self.leader.pk, 'Rolled back')
+                        with transaction.atomic():
+                            notify(self.leader.pk, 'Rolled back with its savepoint')
+                        raise OperationalError
+                except OperationalError:
+                    pass
+                with transaction.atomic():
+                    notify(self.leader.pk, 'Released')
+                notify(self.leader.pk, 'After')
+        self.assertEqual(
+            sorted(Notification.objects.values_list('message', flat=True)), ['After', 'Before', 'Released']
+        )
+        # One INSERT for the outer level and one for the released savepoint.
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "event_notification"')]
+        self.assertEqual(len(inserts), 2)
+
+
+class PlanUploadTests(TestCase):
+    """
+    Plans arrive in chunks, can resume after a gap, and identical files are stored once.
+    """
+    PDF = b'%PDF-1.7\n' + b'x' * 2500 + b'\n%%EOF\n'
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.enterContext(mock.patch.object(uploads, 'CHUNK_SIZE', 1000))
+        self.media_root = media_root
+        self.users = User.objects.bulk_create([User(username=f'user{i}') for i in range(2)])
+        self.teams = [
+            teams.create_team(Team(team_name=f'Team {i}', team_code=f'T{i}'), user) for i, user in enumerate(self.users)
+        ]
+
+    def test_stale_team_is_refused(self):
+        # As if another worker had cached the user's team before they left it.
+        leaver = User.objects.create(username='leaver')
+        cache.set(participants._cache_key(leaver.pk), ('participant', self.teams[0].pk))
+        self.addCleanup(participants.forget, leaver.pk)
+        self.client.force_login(leaver)
+        with mock.patch.object(caching, 'cache_is_shared', return_value=True):
+            response = self.client.post(reverse('plan_upload_start'), {'size': len(self.PDF)})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(PlanUpload.objects.exists())
+
+    def upload(self, user, data, skip_to=None):
+        self.client.force_login(user)
+        started = self.client.post(reverse('plan_upload_start'), {'size': len(data)}).json()
+        url = reverse('plan_upload_chunk', args=[started['upload_id']])
+        offset = 0
+        if skip_to is not None:
+            response = self.client.post(url, data[skip_to:skip_to + 1000], content_type='application/octet-stream',
+                                        headers={'Upload-Offset': str(skip_to)})
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(self.client.get(url).json()['offset'], 0)
+        while offset < len(data):
+            response = self.client.post(url, data[offset:offset + 1000], content_type='application/octet-stream',
+                                        headers={'Upload-Offset': str(offset)})
+            self.assertEqual(response.status_code, 200, response.content)
+            offset = response.json()['offset']
+        return response.json()
+
+    def test_chunks_assemble_into_a_deduplicated_plan(self):
+        self.assertTrue(self.upload(self.users[0], self.PDF, skip_to=1000)['complete'])
+        self.upload(self.users[1], self.PDF)
+
+        names = set(Submission.objects.values_list('plan_pdf', flat=True))
+        self.assertEqual(len(names), 1)
+        with open(os.path.join(self.media_root, names.pop()), 'rb') as plan:
+            self.assertEqual(plan.read(), self.PDF)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'plans', 'partial')), [])
+        self.assertFalse(PlanUpload.objects.exists())
+
+    def test_non_pdf_is_rejected_on_first_chunk(self):
+        self.client.force_login(self.users[0])
+        started = self.client.post(reverse('plan_upload_start'), {'size': 3000}).json()
+        response = self.client.post(reverse('plan_upload_chunk', args=[started['upload_id']]), b'MZ' + b'x' * 998,
+                                    content_type='application/octet-stream', headers={'Upload-Offset': '0'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PlanUpload.objects.exists())
+
+
+class MediaServingTests(TestCase):
+    """
+    Media is served only to those allowed to see it, with ranges and conditional GETs.
+    """
+    PDF = b'%PDF-1.7\n' + bytes(range(256)) * 4 + b'\n%%EOF\n'
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        os.makedirs(os.path.join(media_root, 'plans'))
+        with open(os.path.join(media_root, 'plans', 'plan.pdf'), 'wb') as plan:
+            plan.write(self.PDF)
+
+        member, judge, outsider = User.objects.bulk_create([User(username=name) for name in ('member', 'judge', 'outsider')])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=member, user_role='participant'),
+            UserProfile(user=judge, user_role='judge'),
+            UserProfile(user=outsider, user_role='participant'),
+        ])
+        team = teams.create_team(Team(team_name='Alpha', team_code='ALPHA'), member)
+        Submission.objects.create(team=team, plan_pdf='plans/plan.pdf')
+        self.member, self.judge, self.outsider = member, judge, outsider
+        self.url = reverse('media_file', args=['plans/plan.pdf'])
+
+    def test_access(self):
+        for user, status in ((self.member, 200), (self.judge, 200), (self.outsider, 404)):
+            self.client.force_login(user)
+            self.assertEqual(self.client.get(self.url).status_code, status, user.username)
+
+    def test_parent_directory_paths_are_refused(self):
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'certificates'))
+        with open(os.path.join(settings.MEDIA_ROOT, 'certificates', 'other.png'), 'wb') as certificate:
+            certificate.write(b'not yours')
+        self.client.force_login(self.judge)
+        for path in ('plans/../certificates/other.png', 'plans/../../settings.py', 'plans/./../certificates/other.png'):
+            response = self.client.get(reverse('media_file', args=[path]))
+            self.assertEqual(response.status_code, 404, path)
+
+    def test_range_and_conditional_get(self):
+        self.client.force_login(self.judge)
+        response = self.client.get(self.url, headers={'Range': 'bytes=9-18'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.PDF[9:19])
+        self.assertEqual(response['Content-Range'], f'bytes 9-18/{len(self.PDF)}')
+
+        response = self.client.get(self.url, headers={'Range': 'bytes=-7'})
+        self.assertEqual(b''.join(response.streaming_content), self.PDF[-7:])
+        self.assertEqual(self.client.get(self.url, headers={'Range': f'bytes={len(self.PDF)}-'}).status_code, 416)
+
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+
+    def test_asgi_streams_in_blocks(self):
+        self.async_client.force_login(self.judge)
+
+        async def fetch(**headers):
+            response = await self.async_client.get(self.url, headers=headers)
+            return response, [block async for block in response.streaming_content]
+
+        with mock.patch.object(media, 'BLOCK_SIZE', 100):
+            response, blocks = async_to_sync(fetch)()
+            self.assertTrue(response.is_async)
+            self.assertEqual(b''.join(blocks), self.PDF)
+            self.assertEqual(max(map(len, blocks)), 100)
+
+            response, blocks = async_to_sync(fetch)(Range='bytes=9-258')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(blocks), self.PDF[9:259])
+
+    def test_proxy_sends_the_file(self):
+        self.client.force_login(self.member)
+        with override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/plans/plan.pdf')
+        self.assertEqual(response.content, b'')
+
+
+class StaticBuildTests(TestCase):
+    """
+    The static build adds resized image copies that the templates offer once built.
+    """
+    TAG = Template("{% load assets %}{% responsive_image 'images/logo.png' 32 alt='Logo' %}")
+
+    def test_original_until_built(self):
+        self.assertHTMLEqual(self.TAG.render(Context()), '<img src="/static/images/logo.png" alt="Logo">')
+
+    def test_build(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        storages = {**settings.STORAGES, 'staticfiles': {'BACKEND': 'event.storage.StaticFilesStorage'}}
+        with override_settings(STATIC_ROOT=static_root, STORAGES=storages):
+            out = io.StringIO()
+            call_command('build_static', stdout=out)
+            html = self.TAG.render(Context())
+
+            self.assertIn('Images:', out.getvalue())
+            self.assertIn('<source type="image/avif"', html)
+            self.assertRegex(html, r'logo-32w\.[0-9a-f]{12}\.png 32w, /static/images/variants/logo-64w\.[0-9a-f]{12}\.png 64w')
+            copies = [copy for copy, _ in assets.built_copies('images/logo.png', 'avif')]
+            self.assertEqual(copies, ['images/variants/logo-32w.avif', 'images/variants/logo-64w.avif'])
+            for copy in copies:
+                self.assertLess(staticfiles_storage.size(copy), 1024)
+            self.assertTrue(staticfiles_storage.exists(staticfiles_storage.stored_name('css/main.css') + '.gz'))
+
+    def test_build_without_avif(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        storages = {**settings.STORAGES, 'staticfiles': {'BACKEND': 'event.storage.StaticFilesStorage'}}
+        with override_settings(STATIC_ROOT=static_root, STORAGES=storages), \
+                mock.patch.object(assets.features, 'check', side_effect=lambda feature: feature != 'avif'):
+            out = io.StringIO()
+            call_command('build_static', stdout=out)
+            html = self.TAG.render(Context())
+
+            self.assertIn('Images:', out.getvalue())
+            self.assertNotIn('image/avif', html)
+            self.assertIn('<source type="image/webp"', html)
+            self.assertEqual(assets.built_copies('images/logo.png', 'avif'), [])
+            self.assertEqual(assets.variant_url('images/logo.png', 32, 'avif'), assets.variant_url('images/logo.png', 32, 'png'))
@@ -0,0 +1,143 @@
+"""
+Chunked, resumable uploads of a team's plan PDF.
+
+The client starts an upload with the file's size, then sends the bytes in
+order, at most CHUNK_SIZE per request, each tagged with its offset. A request
+whose offset doesn't match what has been received is refused with the current
+offset, so a client that lost its connection picks up where the server left
+off. Each chunk is a short request: under ASGI the slow part, reading the
+body off the network, happens before the view and holds no worker thread.
+
+The first bytes are checked to be a PDF as soon as they arrive. When the last
+chunk is in, the file is hashed and moved into place as
+MEDIA_ROOT/plans/<hash>.pdf, so identical plans are stored once, and only then
+is it attached to the team's Submission.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.db import transaction
+
+from . import caching
+from .models import PlanUpload, Submission
+
+CHUNK_SIZE = 1024 * 1024
+MAX_PLAN_SIZE = 20 * 1024 * 1024
+PDF_MAGIC = b'%PDF-'
+# A PDF ends with %%EOF, possibly followed by a line ending or some padding.
+PDF_TRAILER = b'%%EOF'
+TRAILER_WINDOW = 1024
+
+
+class UploadError(Exception):
+    """
+    The upload can't continue; `status` is the HTTP status to answer with.
+    """
+    status = 400
+
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+    def __init__(self, received):
+        super().__init__(f"Expected the chunk at offset {received}.")
+        self.received = received
+
+
+def _partial_path(upload_id):
+    return os.path.join(settings.MEDIA_ROOT, 'plans', 'partial', f'{upload_id}.part')
+
+
+def _discard(upload):
+    try:
+        os.remove(_partial_path(upload.pk))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def start(team, size):
+    """
+    Begin uploading a plan of `size` bytes for `team`, replacing any upload the team left unfinished.
+    """
+    if not 0 < size <= MAX_PLAN_SIZE:
+        raise UploadError(f"Plans must be between 1 byte and {MAX_PLAN_SIZE // (1024 * 1024)} MB.")
+    for stale in PlanUpload.objects.filter(team=team):
+        _discard(stale)
+    upload = PlanUpload.objects.create(team=team, size=size)
+    os.makedirs(os.path.dirname(_partial_path(upload.pk)), exist_ok=True)
+    open(_partial_path(upload.pk), 'wb').close()
+    return upload
+
+
+def append(upload_id, team_id, offset, data):
+    """
+    Write `data` at `offset` of the upload and return the PlanUpload. Attaches
+    the file to the team's Submission once the last byte is in. Raises
+    PlanUpload.DoesNotExist for an unknown upload or another team's, and
+    UploadError if the chunk can't be accepted.
+    """
+    with transaction.atomic():
+        # The row lock serialises concurrent chunks of the same upload.
+        upload = PlanUpload.objects.select_for_update().get(pk=upload_id, team_id=team_id)
+        if offset != upload.received:
+            raise OffsetMismatch(upload.received)
+        if not data or len(data) > CHUNK_SIZE or upload.received + len(data) > upload.size:
+            raise UploadError(f"Send between 1 byte and {CHUNK_SIZE} bytes, up to the size given at the start.")
+        with open(_partial_path(upload.pk), 'r+b') as partial:
+            # Bytes past `received` are left over from a write that never committed.
+            partial.seek(offset)
+            partial.write(data)
+            partial.truncate()
+            looks_like_pdf = True
+            if offset < len(PDF_MAGIC):
+                partial.seek(0)
+                head = partial.read(len(PDF_MAGIC))
+                looks_like_pdf = head == PDF_MAGIC[:len(head)]
+        if looks_like_pdf:
+            upload.received = offset + len(data)
+            upload.save(update_fields=['received'])
+
+    if not looks_like_pdf:
+        _discard(upload)
+        raise UploadError("Only PDF files can be uploaded.")
+    if upload.received == upload.size:
+        attach(upload)
+    return upload
+
+
+def attach(upload):
+    """
+    Check the finished file looks like a whole PDF, store it under its content
+    hash (reusing an identical file already stored) and point the team's
+    Submission at it.
+    """
+    path = _partial_path(upload.pk)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as partial:
+        for block in iter(lambda: partial.read(CHUNK_SIZE), b''):
+            digest.update(block)
+        partial.seek(max(upload.size - TRAILER_WINDOW, 0))
+        tail = partial.read()
+    if PDF_TRAILER not in tail:
+        _discard(upload)
+        raise UploadError("The file is not a complete PDF.")
+
+    name = f'plans/{digest.hexdigest()[:32]}.pdf'
+    final_path = os.path.join(settings.MEDIA_ROOT, name)
+    if os.path.exists(final_path):
+        os.remove(path)
+    else:
+        # Same filesystem, so readers see either no file or the whole file.
+        os.replace(path, final_path)
+
+    with transaction.atomic():
+        # Only the file column changes; the rest of the submission isn't re-saved.
+        if not Submission.objects.filter(team_id=upload.team_id).update(plan_pdf=name):
+            Submission.objects.create(
+                team_id=upload.team_id, problem_statement_id=upload.team.selected_problem_id, plan_pdf=name
+            )
+        upload.delete()
+    caching.bump('submission')
+    return name
@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
     # General Pages
     path('', views.home, name='home'),
+    path('schedule.json', views.schedule_json, name='schedule_json'),
     path('teams/', views.team_list, name='team_list'),
 
     # Auth & Profile
@@ -29,6 +31,8 @@ urlpatterns = [
     # Playground & Submission
     path('team/select_problem/<int:problem_id>/', views.select_problem, name='select_problem'),
     path('playground/', views.submit_playground, name='submit_playground'),
+    path('playground/plan/uploads/', views.plan_upload_start, name='plan_upload_start'),
+    path('playground/plan/uploads/<uuid:upload_id>/', views.plan_upload_chunk, name='plan_upload_chunk'),
 
     # Judging
     path('submission/<int:submission_id>/score/', views.score_submission, name='score_submission'),
@@ -36,8 +40,20 @@ urlpatterns = [
     # Other Features
     path('feedback/', views.submit_feedback, name='feedback'),
     path('notifications/', views.notification_list, name='notifications'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
     path('certificate/', views.view_certificate, name='view_certificate'),
+    path('certificate/<str:key>.png', views.certificate_image, name='certificate_image'),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", views.media_file, name='media_file'),
 
     # Organizer Views
     path('organizer/team/<int:team_id>/', views.view_team_by_organizer, name='view_team_by_organizer'),
-]
\ No newline at end of file
+    path('organizer/leaderboard/', views.leaderboard_view, name='leaderboard'),
+    path('organizer/export/<str:dataset>.csv', views.export_csv, name='export_csv'),
+
+    # Staff Tools
+    path('staff/perf/', views.perf_report, name='perf_report'),
+]
+
+if settings.ASYNC_VIEWS:
+    from .async_views import use_async_views
+    use_async_views(patterns=urlpatterns)
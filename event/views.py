@@ -1,16 +1,30 @@
+import asyncio
+import posixpath
 import uuid
 import pytz
+from asgiref.sync import sync_to_async
 from datetime import datetime
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.views.decorators.http import condition, require_http_methods, require_POST
 from django.contrib import messages
 from django.contrib.auth import update_session_auth_hash, logout
 from django.contrib.auth.views import LoginView
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
-from django.db.models import Count
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Subquery
 from .models import *
 from .forms import *
+from . import caching, exports, leaderboard, live, media, perf, schedule, teams, uploads
+from . import notifications as inbox
+from .certificates import certificate_key, certificate_name, ensure_certificate, record_rendered
 
 def get_user_role(user):
     if not user.is_authenticated:
@@ -20,38 +34,76 @@ def get_user_role(user):
     except UserProfile.DoesNotExist:
         return None
 
+# ETag functions of the read-heavy pages; event/async_views.py reuses them.
+home_etag = caching.etag_for('scheduleitem', 'scheduledetail', 'faq')
+team_list_etag = caching.etag_for('team', 'teammember', 'problemstatement')
+participant_dashboard_etag = caching.etag_for('announcement')
+judge_dashboard_etag = caching.etag_for(
+    'submission', 'judgingscore', 'team', 'problemstatement',
+    allowed=lambda request: request.participant.role == 'judge' or request.user.is_staff,
+)
+notification_list_etag = caching.etag_for(
+    'announcement', extra=lambda request: [caching.data_version(f'inbox:{request.user.pk}')]
+)
+
+@condition(etag_func=home_etag)
 def home(request):
-    announcements = Announcement.objects.all().order_by('-created_at')[:3]
-    problem_statements = ProblemStatement.objects.all()
+    # Anonymous visitors all see the same page; serve it without touching the database.
+    if not request.user.is_authenticated:
+        cached_page = caching.get_home_page()
+        if cached_page is not None:
+            return HttpResponse(cached_page)
+
+    # These querysets are lazy: when the template's cached fragments are warm
+    # they are never evaluated.
     faqs = FAQ.objects.all().order_by('id')
-    schedule_day1 = ScheduleItem.objects.filter(day='Day 1: Sep 25, 2025').order_by('start_time')
-    schedule_day2 = ScheduleItem.objects.filter(day='Day 2: Sep 26, 2025').order_by('start_time')
-    schedule_day3 = ScheduleItem.objects.filter(day='Day 3: Sep 27, 2025').order_by('start_time')
-    profile_complete = False
-    if request.user.is_authenticated:
-        try:
-            profile_complete = request.user.userprofile.is_profile_complete()
-        except UserProfile.DoesNotExist:
-            profile_complete = False
-
+    profile = request.participant.profile
     context = {
-        'announcements': announcements,
-        'profile_complete': profile_complete,
-         #'problem_statements': problem_statements,
+        'profile_complete': profile.is_profile_complete() if profile else False,
         'faqs': faqs,
-        'schedule_day1': schedule_day1,
-        'schedule_day2': schedule_day2,
-        'schedule_day3': schedule_day3,
+        # Called by the template only when the fragment has to be rendered.
+        'schedule_days': schedule.days,
+        'home_cache_timeout': caching.home_cache_timeout(),
     }
-    return render(request, 'event/index.html', context)
+    response = render(request, 'event/index.html', context)
+    if not request.user.is_authenticated:
+        caching.set_home_page(response)
+    return response
+
+@condition(etag_func=lambda request: schedule.get_schedule()['etag'])
+def schedule_json(request):
+    """
+    The grouped schedule as JSON, for widgets that poll it. Clients that send
+    back the ETag get a 304 straight from the cache.
+    """
+    response = HttpResponse(schedule.get_schedule()['json'], content_type='application/json')
+    patch_cache_control(response, public=True, max_age=60)
+    return response
 
 @login_required
+@condition(etag_func=team_list_etag)
 def team_list(request):
-    teams = Team.objects.annotate(member_count=Count('teammember')).filter(member_count__gt=0)
-    user_on_team = TeamMember.objects.filter(participant=request.user, status='accepted').exists()
+    query = request.GET.get('q', '').strip()
+    open_only = request.GET.get('open') == '1'
+    problem_id = request.GET.get('problem')
+    problem_id = int(problem_id) if problem_id and problem_id.isdigit() else None
+    team_page, next_cursor = teams.browse(query, open_only, problem_id, request.GET.get('after'))
+
+    next_params = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['after'] = next_cursor
+        next_params = params.urlencode()
+
     context = {
-        'teams': teams,
-        'user_on_team': user_on_team,
+        'teams': team_page,
+        'user_on_team': request.participant.on_team,
+        'problems': ProblemStatement.objects.order_by('title').only('id', 'title'),
+        'query': query,
+        'open_only': open_only,
+        'problem_id': problem_id,
+        'is_first_page': 'after' not in request.GET,
+        'next_params': next_params,
     }
     return render(request, 'event/team_list.html', context)
 
@@ -87,7 +139,7 @@ def profile_view(request):
                 messages.success(request, 'Your account details have been updated successfully!')
                 return redirect('profile')
         elif 'update_profile' in request.POST:
-            profile_form = UserProfileForm(request.POST, instance=request.user.userprofile)
+            profile_form = UserProfileForm(request.POST, instance=request.participant.profile)
             if profile_form.is_valid():
                 profile_form.save()
                 messages.success(request, 'Your profile has been updated successfully!')
@@ -103,48 +155,67 @@ def profile_view(request):
                 messages.error(request, 'Please correct the password errors below.')
 
     user_form = UserUpdateForm(instance=request.user)
-    profile_form = UserProfileForm(instance=request.user.userprofile)
+    profile_form = UserProfileForm(instance=request.participant.profile)
     password_form = CustomPasswordChangeForm(request.user)
     context = {
         'user_form': user_form,
         'profile_form': profile_form,
         'password_form': password_form,
-        'role': get_user_role(request.user),
+        'role': request.participant.role,
     }
     return render(request, 'event/profile.html', context)
 
 @login_required
+@condition(etag_func=participant_dashboard_etag)
 def participant_dashboard(request):
-    profile_complete = False
-    try:
-        profile_complete = request.user.userprofile.is_profile_complete()
-    except UserProfile.DoesNotExist:
-        pass
-
+    profile = request.participant.profile
     announcements = Announcement.objects.all().order_by('-created_at')[:5]
     context = {
         'announcements': announcements,
-        'profile_complete': profile_complete,
-        'role': get_user_role(request.user),
+        'profile_complete': profile.is_profile_complete() if profile else False,
+        'role': request.participant.role,
     }
     return render(request, 'event/dashboard_participant.html', context)
 
 @login_required
+@condition(etag_func=judge_dashboard_etag)
 def judge_dashboard(request):
-    role = get_user_role(request.user)
+    role = request.participant.role
     if not (role == 'judge' or request.user.is_staff):
         raise PermissionDenied("You do not have permission to access this page.")
 
-    submissions = Submission.objects.all()
+    # One query per page: team and problem are joined in, and the judge's own
+    # score is annotated so unscored submissions can be listed first.
+    my_scores = JudgingScore.objects.filter(judge=request.user, submission=OuterRef('pk'))
+    submissions = (
+        Submission.objects.select_related('team', 'problem_statement')
+        .annotate(has_scored=Exists(my_scores), my_score=Subquery(my_scores.values('score')[:1]))
+        .order_by('has_scored', 'id')
+    )
+    show = request.GET.get('show', 'all')
+    if show == 'unscored':
+        submissions = submissions.filter(has_scored=False)
+    elif show == 'scored':
+        submissions = submissions.filter(has_scored=True)
+
+    progress = Submission.objects.aggregate(
+        total=Count('id', distinct=True),
+        scored=Count('judgingscore', filter=Q(judgingscore__judge=request.user)),
+    )
+    page = Paginator(submissions, 25).get_page(request.GET.get('page'))
     context = {
-        'submissions': submissions,
+        'submissions': page,
+        'page_obj': page,
+        'show': show,
+        'scored_count': progress['scored'],
+        'total_count': progress['total'],
         'role': role,
     }
     return render(request, 'event/dashboard_judge.html', context)
 
 @login_required
 def organizer_dashboard(request):
-    role = get_user_role(request.user)
+    role = request.participant.role
     if not (role == 'organizer' or request.user.is_staff):
         raise PermissionDenied("You do not have permission to access this page.")
 
@@ -157,13 +228,13 @@ def organizer_dashboard(request):
 
 @login_required
 def team_dashboard(request):
-    team_member = TeamMember.objects.filter(participant=request.user, status='accepted').first()
-    user_role = get_user_role(request.user)
+    team_member = request.participant.membership
+    user_role = request.participant.role
 
     if team_member:
         team = team_member.team
-        members = TeamMember.objects.filter(team=team, status='accepted')
-        pending_requests = TeamMember.objects.filter(team=team, status='pending')
+        members = TeamMember.objects.filter(team=team, status='accepted').select_related('participant')
+        pending_requests = TeamMember.objects.filter(team=team, status='pending').select_related('participant')
         invite_form = TeamInviteForm()
         context = {
             'team': team,
@@ -175,7 +246,7 @@ def team_dashboard(request):
         return render(request, 'event/team_dashboard.html', context)
     else:
         creation_form = TeamCreationForm()
-        invites = TeamInvite.objects.filter(invited_email=request.user.email, status='pending')
+        invites = TeamInvite.objects.filter(invited_email=request.user.email, status='pending').select_related('team__leader')
         context = {
             'creation_form': creation_form,
             'invites': invites,
@@ -189,10 +260,12 @@ def create_team(request):
         form = TeamCreationForm(request.POST)
         if form.is_valid():
             team = form.save(commit=False)
-            team.leader = request.user
             team.team_code = uuid.uuid4().hex[:8].upper()
-            team.save()
-            TeamMember.objects.create(team=team, participant=request.user, role='leader', status='accepted')
+            try:
+                teams.create_team(team, request.user)
+            except teams.AlreadyOnTeam:
+                messages.error(request, "You are already on a team.")
+                return redirect('team_dashboard')
             messages.success(request, f"Team '{team.team_name}' created successfully!")
     return redirect('team_dashboard')
 
@@ -214,15 +287,11 @@ def invite_member(request):
 @login_required
 def request_to_join_team(request, team_id):
     team = get_object_or_404(Team, id=team_id)
-    if TeamMember.objects.filter(participant=request.user, status='accepted').exists():
+    if request.participant.on_team:
         messages.error(request, "You are already on a team.")
         return redirect('team_list')
 
-    TeamMember.objects.get_or_create(
-        team=team,
-        participant=request.user,
-        defaults={'role': 'member', 'status': 'pending'}
-    )
+    teams.request_to_join(team, request.user)
     messages.success(request, f"Your request to join '{team.team_name}' has been sent.")
     return redirect('team_list')
 
@@ -233,8 +302,15 @@ def handle_join_request(request, member_id, action):
         raise PermissionDenied("You do not have permission to perform this action.")
 
     if action == 'accept':
-        join_request.status = 'accepted'
-        join_request.save(update_fields=['status'])
+        try:
+            teams.accept_member(join_request)
+        except teams.TeamFull:
+            messages.error(request, f"Your team is full; {join_request.participant.username} could not be accepted.")
+            return redirect('team_dashboard')
+        except teams.AlreadyOnTeam:
+            messages.error(request, f"{join_request.participant.username} has already joined another team.")
+            join_request.delete()
+            return redirect('team_dashboard')
         messages.success(request, f"Accepted {join_request.participant.username} into the team.")
     elif action == 'decline':
         messages.info(request, f"Declined join request from {join_request.participant.username}.")
@@ -247,8 +323,15 @@ def handle_invite(request, invite_id, action):
         invite = TeamInvite.objects.get(id=invite_id, invited_email=request.user.email)
         if invite.status == 'pending':
             if action == 'accept':
+                try:
+                    teams.add_member(invite.team, request.user)
+                except teams.TeamFull:
+                    messages.error(request, f"The team '{invite.team.team_name}' is already full.")
+                    return redirect('team_dashboard')
+                except teams.AlreadyOnTeam:
+                    messages.error(request, "You are already on a team.")
+                    return redirect('team_dashboard')
                 invite.status = 'accepted'
-                TeamMember.objects.create(team=invite.team, participant=request.user, role='member', status='accepted')
                 messages.success(request, f"You have joined the team '{invite.team.team_name}'.")
             elif action == 'decline':
                 invite.status = 'declined'
@@ -264,28 +347,29 @@ def select_problem(request, problem_id):
     team = request.user.led_teams.first()
     if not team:
         raise PermissionDenied("You are not the leader of a team.")
-    if problem.teams_working_on.count() >= 3:
+    try:
+        teams.select_problem(team, problem)
+    except teams.ProblemFull:
         messages.error(request, f"Sorry, '{problem.title}' has the maximum number of teams.")
         return redirect('submit_playground')
-    team.selected_problem = problem
-    team.save()
     messages.success(request, f"Your team has selected the problem: '{problem.title}'.")
     return redirect('submit_playground')
 
 @login_required
 def submit_playground(request):
-    try:
-        team = TeamMember.objects.get(participant=request.user, status='accepted').team
-    except TeamMember.DoesNotExist:
+    team = request.participant.team
+    if team is None:
         messages.error(request, "You must be on a team to access the playground.")
         return redirect('participant_dashboard')
     
     submission, created = Submission.objects.get_or_create(team=team, defaults={'problem_statement': team.selected_problem})
 
     if request.method == 'POST':
-        form = SubmissionPlaygroundForm(request.POST, request.FILES, instance=submission)
+        form = SubmissionPlaygroundForm(request.POST, instance=submission)
         if form.is_valid():
-            form.save()
+            # The plan PDF is uploaded separately; write only the fields that changed.
+            if form.has_changed():
+                form.save(commit=False).save(update_fields=form.changed_data + ['submitted_at'])
             messages.success(request, "Your playground has been updated!")
             return redirect('submit_playground')
     else:
@@ -296,19 +380,23 @@ def submit_playground(request):
         'team': team,
         'submission': submission,
         'form': form,
+        'chunk_size': uploads.CHUNK_SIZE,
         #'available_problems': available_problems,
-        'role': get_user_role(request.user),
+        'role': request.participant.role,
     }
     return render(request, 'event/submit_playground.html', context)
 
 @login_required
 def score_submission(request, submission_id):
-    role = get_user_role(request.user)
+    role = request.participant.role
     if not (role == 'judge' or request.user.is_staff):
         raise PermissionDenied("You do not have permission to access this page.")
 
     submission = get_object_or_404(Submission, id=submission_id)
-    score, created = JudgingScore.objects.get_or_create(judge=request.user, submission=submission)
+    # Only create the score row once the judge actually submits one; `score` is required.
+    score = JudgingScore.objects.filter(judge=request.user, submission=submission).first()
+    if score is None:
+        score = JudgingScore(judge=request.user, submission=submission)
     if request.method == 'POST':
         form = JudgingScoreForm(request.POST, instance=score)
         if form.is_valid():
@@ -338,50 +426,261 @@ def submit_feedback(request):
         form = FeedbackForm()
     context = {
         'form': form,
-        'role': get_user_role(request.user),
+        'role': request.participant.role,
     }
     return render(request, 'event/feedback.html', context)
 
 @login_required
+@condition(etag_func=notification_list_etag)
 def notification_list(request):
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    notifications.filter(is_read=False).update(is_read=True)
+    cursor = request.GET.get('before')
+    notifications, next_cursor = inbox.inbox_page(request.user, cursor)
+    # Only what is on screen counts as seen; items render as they were before this visit.
+    inbox.mark_read(request.user, notifications)
     context = {
         'notifications': notifications,
-        'role': get_user_role(request.user),
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
+        'role': request.participant.role,
     }
     return render(request, 'event/notifications.html', context)
 
+# A comment line every so often keeps proxies from closing an idle stream.
+STREAM_KEEPALIVE_SECONDS = 15
+# How long the browser waits before reconnecting a stream that ended.
+STREAM_RETRY_MS = 30000
+
+def _unread_count_then_close(user):
+    """
+    The unread count, after which the connection is closed: a stream may then
+    wait for hours, and shouldn't hold a database connection meanwhile.
+    """
+    try:
+        return inbox.unread_count(user)
+    finally:
+        if not connection.in_atomic_block:
+            connection.close()
+
+async def _notification_events(user):
+    queue = live.broker().subscribe([live.user_channel(user.pk), live.ANNOUNCEMENTS])
+    try:
+        # Subscribed before counting, so nothing created meanwhile is missed.
+        count = await sync_to_async(_unread_count_then_close)(user)
+        yield f'retry: {STREAM_RETRY_MS}\n' + live.format_event('unread', {'count': count})
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield live.format_event(event, data)
+    finally:
+        live.broker().unsubscribe(queue)
+
+@login_required
+async def notification_stream(request):
+    """
+    Server-sent events: the unread count on connect, then every new notification
+    or announcement as it is created (see event/live.py). Under WSGI, or when
+    events can't reach every worker, the stream ends after the count and the
+    browser reconnects after STREAM_RETRY_MS, i.e. it polls.
+    """
+    user = await request.auser()
+    if isinstance(request, ASGIRequest) and live.reaches_every_worker():
+        response = StreamingHttpResponse(_notification_events(user), content_type='text/event-stream')
+    else:
+        count = await sync_to_async(inbox.unread_count)(user)
+        response = HttpResponse(
+            f'retry: {STREAM_RETRY_MS}\n' + live.format_event('unread', {'count': count}),
+            content_type='text/event-stream',
+        )
+    response['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def certificate_unlock_time():
+    return datetime(2025, 9, 27, 11, 0, 0, tzinfo=pytz.timezone('Asia/Kolkata'))
+
+def certificates_unlocked():
+    return datetime.now(pytz.timezone('Asia/Kolkata')) >= certificate_unlock_time()
+
 @login_required
+@condition(etag_func=caching.etag_for('certificate', extra=lambda request: [certificates_unlocked()]))
 def view_certificate(request):
     try:
         certificate = Certificate.objects.get(user=request.user)
     except Certificate.DoesNotExist:
         certificate = None
 
-    unlock_time = datetime(2025, 9, 27, 11, 0, 0, tzinfo=pytz.timezone('Asia/Kolkata'))
-    now = datetime.now(pytz.timezone('Asia/Kolkata'))
-    is_unlocked = now >= unlock_time
+    is_unlocked = certificates_unlocked()
+    certificate_url = None
+    if certificate and is_unlocked and certificate.status != 'failed':
+        try:
+            certificate_url = reverse('certificate_image', args=[certificate_key(certificate_name(request.user))])
+        except FileNotFoundError:
+            certificate_url = None
     context = {
         'certificate': certificate,
+        'certificate_url': certificate_url,
         'is_unlocked': is_unlocked,
-        'unlock_time': unlock_time,
-        'role': get_user_role(request.user),
+        'unlock_time': certificate_unlock_time(),
+        'role': request.participant.role,
     }
     return render(request, 'event/certificate.html', context)
 
+@login_required
+def media_file(request, path):
+    """
+    Uploaded media, for those allowed to see it: plan PDFs for their team,
+    judges and organizers; certificates for their owner and organizers.
+    """
+    path = posixpath.normpath(path)
+    if path.startswith('/') or '..' in path.split('/'):
+        raise Http404("File not found.")
+    staff = request.user.is_staff or request.participant.role == 'organizer'
+    if path.startswith('plans/'):
+        allowed = staff or request.participant.role == 'judge' or (
+            request.participant.team_id is not None
+            and Submission.objects.filter(team_id=request.participant.team_id, plan_pdf=path).exists()
+        )
+    elif path.startswith('certificates/'):
+        allowed = staff or Certificate.objects.filter(user=request.user, certificate_file=path).exists()
+    else:
+        allowed = False
+    if not allowed:
+        # Don't reveal which files exist.
+        raise Http404("File not found.")
+    response = media.serve(request, path)
+    patch_cache_control(response, private=True, max_age=3600)
+    return response
+
+@login_required
+def certificate_image(request, key):
+    """
+    Serve the user's certificate, rendering it on first request. The URL carries the
+    content key (template version + name), so responses can be cached forever and a
+    rename simply moves the user to a new URL.
+    """
+    certificate = get_object_or_404(Certificate, user=request.user)
+    if certificate.status == 'failed' or not certificates_unlocked():
+        raise Http404("Certificate is not available.")
+
+    name = certificate_name(request.user)
+    try:
+        current_key = certificate_key(name)
+    except FileNotFoundError:
+        raise Http404("Certificate template is not available.")
+    if key != current_key:
+        return redirect('certificate_image', key=current_key)
+
+    etag = f'"{current_key}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        relative_path = ensure_certificate(name)
+        record_rendered(certificate, name, relative_path)
+        response = media.serve(
+            request, relative_path, content_type='image/png',
+            filename=f'certificate_{request.user.username}.png', etag=current_key,
+        )
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=31536000, immutable=True)
+    return response
+
 @login_required
 def view_team_by_organizer(request, team_id):
-    role = get_user_role(request.user)
+    role = request.participant.role
     if not (role == 'organizer' or request.user.is_staff):
         raise PermissionDenied("You do not have permission to access this page.")
-    team = get_object_or_404(Team, id=team_id)
+    team = get_object_or_404(
+        Team.objects.select_related('leader').prefetch_related(
+            Prefetch('teammember_set', queryset=TeamMember.objects.select_related('participant'))
+        ),
+        id=team_id,
+    )
     context = {
         'team': team,
         'role': role,
     }
     return render(request, 'event/view_team_by_organizer.html', context)
 
+@login_required
+def leaderboard_view(request):
+    role = request.participant.role
+    if not (role == 'organizer' or request.user.is_staff):
+        raise PermissionDenied("You do not have permission to access this page.")
+    context = {
+        'entries': leaderboard.ranking(),
+        'role': role,
+    }
+    return render(request, 'event/leaderboard.html', context)
+
+@login_required
+def export_csv(request, dataset):
+    role = request.participant.role
+    if not (role == 'organizer' or request.user.is_staff):
+        raise PermissionDenied("You do not have permission to access this page.")
+    if dataset not in exports.DATASETS:
+        raise Http404("Unknown export.")
+    if isinstance(request, ASGIRequest):
+        content = exports.astream_csv(dataset)
+    else:
+        content = exports.stream_csv(dataset)
+    response = StreamingHttpResponse(content, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.csv"'
+    return response
+
+@login_required
+def perf_report(request):
+    if not request.user.is_staff:
+        raise PermissionDenied("You do not have permission to access this page.")
+    if request.method == 'POST' and request.POST.get('reset'):
+        perf.stats.reset()
+    return JsonResponse({'enabled': settings.PERF_MONITOR, 'views': perf.stats.report()})
+
+
+@login_required
+@require_POST
+def plan_upload_start(request):
+    """
+    Begin a chunked upload of the team's plan PDF (see event/uploads.py).
+    """
+    team = request.participant.team
+    if team is None:
+        raise PermissionDenied("You must be on a team to upload a plan.")
+    try:
+        upload = uploads.start(team, int(request.POST.get('size', 0)))
+    except ValueError:
+        return JsonResponse({'error': "Give the file size in bytes."}, status=400)
+    except uploads.UploadError as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+    return JsonResponse({'upload_id': str(upload.pk), 'offset': 0, 'chunk_size': uploads.CHUNK_SIZE}, status=201)
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def plan_upload_chunk(request, upload_id):
+    """
+    GET reports how much of the upload has arrived, so a client can resume;
+    POST appends the request body at the offset in the Upload-Offset header.
+    """
+    team_id = request.participant.team_id
+    if request.method == 'GET':
+        upload = get_object_or_404(PlanUpload, pk=upload_id, team_id=team_id)
+        return JsonResponse({'offset': upload.received, 'size': upload.size})
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return JsonResponse({'error': "Missing Upload-Offset header."}, status=400)
+    try:
+        upload = uploads.append(upload_id, team_id, offset, request.body)
+    except PlanUpload.DoesNotExist:
+        raise Http404("No such upload.")
+    except uploads.OffsetMismatch as error:
+        return JsonResponse({'error': str(error), 'offset': error.received}, status=error.status)
+    except uploads.UploadError as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+    return JsonResponse({'offset': upload.received, 'size': upload.size, 'complete': upload.received == upload.size})
 
 @login_required
 def delete_team(request):
@@ -396,20 +695,18 @@ def delete_team(request):
 @login_required
 def exit_team(request):
     if request.method == 'POST':
-        try:
-            team_member = TeamMember.objects.get(participant=request.user, status='accepted')
-
-            if team_member.role == 'leader':
-                messages.error(request, "As the team leader, you cannot leave the team. You must delete it instead.")
-                return redirect('team_dashboard')
+        team_member = request.participant.membership
+        if team_member is None:
+            messages.error(request, "You are not on a team.")
+            return redirect('participant_dashboard')
 
-            team_name = team_member.team.team_name
-            team_member.delete()
-            messages.success(request, f"You have successfully left the team '{team_name}'.")
+        if team_member.role == 'leader':
+            messages.error(request, "As the team leader, you cannot leave the team. You must delete it instead.")
             return redirect('team_dashboard')
 
-        except TeamMember.DoesNotExist:
-            messages.error(request, "You are not on a team.")
-            return redirect('participant_dashboard')
+        team_name = team_member.team.team_name
+        team_member.delete()
+        messages.success(request, f"You have successfully left the team '{team_name}'.")
+        return redirect('team_dashboard')
 
     return redirect('team_dashboard')
\ No newline at end of file
@@ -26,15 +26,47 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',  # replaced when ASYNC_VIEWS is on, see below
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'event.middleware.ParticipantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'event.middleware.PerformanceMiddleware',
 ]
 
+# Serve the read-heavy pages from async views (event/async_views.py) under
+# ASGI. These only answer cache hits on the event loop; any page that needs the
+# database still renders in a worker thread. Off by default: on this middleware
+# stack they benchmark no faster than the sync views (`manage.py
+# benchmark_asgi`), since Django's own middleware still hops to a thread per call. Turning it on also swaps in a WhiteNoise
+# middleware that can run async, so the chain isn't forced into a thread.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+if ASYNC_VIEWS:
+    MIDDLEWARE[MIDDLEWARE.index('whitenoise.middleware.WhiteNoiseMiddleware')] = 'event.middleware.WhiteNoiseMiddleware'
+
+# Worker processes serving the site; gunicorn reads the same variable.
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+
+# Keep the notification badge current over a server-sent event stream
+# (event/live.py). Each open page holds a connection to a worker while the
+# stream is open, so it is off unless LIVE_NOTIFICATIONS=1; the badge then
+# shows the count the page was rendered with.
+LIVE_NOTIFICATIONS = os.environ.get('LIVE_NOTIFICATIONS') == '1'
+
+# How new notifications reach open notification streams (event/live.py):
+# 'local' fans out within one process, so it is only used with a single
+# worker; 'postgres' relays through LISTEN/NOTIFY so streams in every worker
+# receive them.
+LIVE_EVENTS_BACKEND = os.environ.get('LIVE_EVENTS_BACKEND', 'local')
+
+# Per-request query/latency instrumentation (see event/perf.py). Off unless
+# PERF_MONITOR=1; samples are also appended to PERF_MONITOR_LOG when set.
+PERF_MONITOR = os.environ.get('PERF_MONITOR') == '1'
+PERF_MONITOR_LOG = os.environ.get('PERF_MONITOR_LOG') or None
+
 ROOT_URLCONF = 'summit_site.urls'
 
 TEMPLATES = [
@@ -49,6 +81,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'event.context_processors.unread_notifications_count',
+                'event.context_processors.participant',
             ],
         },
     },
@@ -62,6 +95,20 @@ DATABASES = {
         conn_max_age=600
     )
 }
+# SQLite has no row locks; start write transactions with BEGIN IMMEDIATE so
+# concurrent capacity checks (event/teams.py) queue instead of racing.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+# Cache used for unread-notification counters and other per-user counters.
+# Local memory is per worker process; point CACHE_BACKEND/CACHE_LOCATION at a
+# shared backend to have every worker see the same counters.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'nextgensummit'),
+    }
+}
+
 # Password validation
 # ... (Password validators, Internationalization, etc.) ...
 
@@ -78,13 +125,27 @@ STATIC_ROOT = BASE_DIR / 'staticfiles' # This line is required for collectstatic
 # Media files (User uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Let the front proxy send media files: with e.g. '/protected-media/' (an nginx
+# `internal` location aliased to MEDIA_ROOT) the media view only checks access
+# and answers with X-Accel-Redirect. Unset, Django streams the file itself.
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Certificates are rendered on first download. Set to True to also render them
+# in the background job queue as soon as a team submits.
+CERTIFICATE_PRERENDER = os.environ.get('CERTIFICATE_PRERENDER') == '1'
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 if not DEBUG:
     # Tell Django to copy static assets into a path called `staticfiles` (this is specific to Render)
     STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-    # Enable the WhiteNoise storage backend, which compresses static files to reduce disk use
-    # and renames the files with unique names for each version to support long-term caching
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
\ No newline at end of file
+    # WhiteNoise's storage, which compresses static files and renames them with unique names
+    # for each version to support long-term caching, plus resized copies of the images
+    # (see event/assets.py). `manage.py build_static` runs collectstatic and reports the savings.
+    STORAGES['staticfiles'] = {'BACKEND': 'event.storage.StaticFilesStorage'}